@@ -0,0 +1,38 @@
+"""add query history datasource recent index
+
+Revision ID: 0007
+Revises: 0006
+Create Date: 2026-10-15
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0007'
+down_revision = '0006'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # QueryHistory: datasource_id + success + created_at for the chatbot's
+    # recent successful queries; supersedes the (datasource_id, success) prefix
+    op.create_index(
+        'ix_query_history_datasource_success_created',
+        'query_history',
+        ['datasource_id', 'success', 'created_at'],
+        unique=False
+    )
+    op.drop_index('ix_query_history_datasource_success', table_name='query_history')
+
+
+def downgrade():
+    op.create_index(
+        'ix_query_history_datasource_success',
+        'query_history',
+        ['datasource_id', 'success'],
+        unique=False
+    )
+    op.drop_index('ix_query_history_datasource_success_created', table_name='query_history')
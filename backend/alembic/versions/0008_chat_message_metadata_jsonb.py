@@ -0,0 +1,39 @@
+"""store chat message metadata as jsonb
+
+Revision ID: 0008
+Revises: 0007
+Create Date: 2026-10-15
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision = '0008'
+down_revision = '0007'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.alter_column(
+        'chat_messages',
+        'metadata',
+        type_=postgresql.JSONB(astext_type=sa.Text()),
+        existing_type=sa.JSON(),
+        existing_nullable=True,
+        postgresql_using='metadata::jsonb'
+    )
+
+
+def downgrade():
+    op.alter_column(
+        'chat_messages',
+        'metadata',
+        type_=sa.JSON(),
+        existing_type=postgresql.JSONB(astext_type=sa.Text()),
+        existing_nullable=True,
+        postgresql_using='metadata::json'
+    )
@@ -8,7 +8,7 @@ from app.models.datasource import DataSource
 from app.models.user import User
 from app.api.v1.deps import get_current_active_user
 from app.services.analytics import (
-    AnalyticsEngine,
+    analytics_engine,
     AggregationFunction,
     FilterOperator,
     TimeInterval
@@ -16,7 +16,6 @@ from app.services.analytics import (
 
 
 router = APIRouter()
-analytics_engine = AnalyticsEngine()
 
 
 # Request/Response Models
@@ -24,6 +23,7 @@ class FilterRequest(BaseModel):
     column: str
     operator: str  # FilterOperator value
     value: Any
+    pattern: bool = False  # like only: value is a LIKE pattern, not a literal substring
 
 
 class SortRequest(BaseModel):
@@ -88,15 +88,8 @@ def execute_analytics_query(
         )
     
     try:
-        # Get data
-        df = analytics_engine.get_data(datasource, limit=request.limit, table_name=request.table_name)
+        filter_dicts = [f.model_dump() for f in request.filters] if request.filters else None
         
-        # Apply filters
-        if request.filters:
-            filter_dicts = [f.model_dump() for f in request.filters]
-            df = analytics_engine.filter_data(df, filter_dicts)
-        
-        # Apply aggregations
         if request.aggregations or request.group_by:
             # Convert string function names to AggregationFunction enum
             agg_dict = {}
@@ -104,11 +97,22 @@ def execute_analytics_query(
                 for col, func_names in request.aggregations.items():
                     agg_dict[col] = [AggregationFunction(f) for f in func_names]
             
-            df = analytics_engine.aggregate_data(
-                df,
+            # Filter and aggregate at the source where it supports pushdown
+            df = analytics_engine.aggregate_data_source(
+                datasource,
                 group_by=request.group_by,
-                aggregations=agg_dict if agg_dict else None
+                aggregations=agg_dict if agg_dict else None,
+                filters=filter_dicts,
+                limit=request.limit,
+                table_name=request.table_name
             )
+        else:
+            # Get data
+            df = analytics_engine.get_data(datasource, limit=request.limit, table_name=request.table_name)
+            
+            # Apply filters
+            if filter_dicts:
+                df = analytics_engine.filter_data(df, filter_dicts)
         
         # Apply sorting
         if request.sort_by:
@@ -157,14 +161,6 @@ def process_time_series(
         )
     
     try:
-        # Get data
-        df = analytics_engine.get_data(datasource, limit=request.limit, table_name=request.table_name)
-        
-        # Apply filters first
-        if request.filters:
-            filter_dicts = [f.model_dump() for f in request.filters]
-            df = analytics_engine.filter_data(df, filter_dicts)
-        
         # Convert aggregations
         agg_dict = None
         if request.aggregations:
@@ -172,14 +168,17 @@ def process_time_series(
             for col, func_names in request.aggregations.items():
                 agg_dict[col] = [AggregationFunction(f) for f in func_names]
         
-        # Process time series
+        # Filter and bucket at the source where it supports pushdown
         interval = TimeInterval(request.interval)
-        df_result = analytics_engine.process_time_series(
-            df=df,
+        df_result = analytics_engine.aggregate_data_source(
+            datasource,
+            group_by=request.group_by,
+            aggregations=agg_dict,
+            filters=[f.model_dump() for f in request.filters] if request.filters else None,
             time_column=request.time_column,
             interval=interval,
-            aggregations=agg_dict,
-            group_by=request.group_by
+            limit=request.limit,
+            table_name=request.table_name
         )
         
         # Apply limit
@@ -1,10 +1,12 @@
 from typing import List, Optional
+import json
 from fastapi import APIRouter, Depends, HTTPException, status, Query
+from fastapi.responses import StreamingResponse
 from sqlalchemy.orm import Session
 from sqlalchemy import desc, and_, or_, func
 from datetime import datetime
 
-from app.core.database import get_db
+from app.core.database import SessionLocal, get_db
 from app.models.chatbot import Conversation, ChatMessage, QueryHistory
 from app.models.user import User
 from app.schemas.chatbot import (
@@ -14,6 +16,7 @@ from app.schemas.chatbot import (
     ConversationCreate,
     ConversationList,
     ChatMessage as ChatMessageSchema,
+    ChatMessageLite,
     QueryHistory as QueryHistorySchema,
     QueryHistoryFilter,
     QueryHistoryStats
@@ -29,12 +32,15 @@ chatbot_service = ChatbotService()
 @router.post("/chat", response_model=ChatResponse, status_code=status.HTTP_200_OK)
 async def chat(
     request: ChatRequest,
+    refresh_schema: bool = Query(False, description="Re-read the datasource schema instead of using the cached one"),
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_active_user)
 ):
     """Send a message to the chatbot and get a response."""
+    if refresh_schema and request.datasource_id:
+        chatbot_service.invalidate_schema(request.datasource_id)
     try:
-        result = chatbot_service.process_message(
+        result = await chatbot_service.aprocess_message(
             user=current_user,
             message=request.message,
             conversation_id=request.conversation_id,
@@ -42,34 +48,7 @@ async def chat(
             db=db
         )
         response = ChatResponse(**result)
-        
-        # Broadcast user message first
-        from app.api.v1.endpoints.websocket import broadcast_user_message
-        await broadcast_user_message(
-            response.conversation_id,
-            current_user.id,
-            request.message
-        )
-        
-        # Broadcast assistant response to all subscribers
-        await broadcast_chat_message(
-            response.conversation_id,
-            {
-                "id": response.message_id,
-                "role": "assistant",
-                "content": response.message,
-                "metadata": {
-                    "sql_query": response.sql_query,
-                    "execution_result": response.execution_result,
-                    "visualization_suggestion": response.visualization_suggestion,
-                    "statistical_summary": response.statistical_summary,
-                    "insights": response.insights,
-                    "suggested_queries": response.suggested_queries,
-                },
-                "created_at": str(datetime.utcnow()),
-            }
-        )
-        
+        await _broadcast_exchange(response, current_user.id, request.message)
         return response
     except ValueError as e:
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
@@ -80,6 +59,76 @@ async def chat(
         )
 
 
+@router.post("/chat/stream", status_code=status.HTTP_200_OK)
+async def chat_stream(
+    request: ChatRequest,
+    refresh_schema: bool = Query(False, description="Re-read the datasource schema instead of using the cached one"),
+    current_user: User = Depends(get_current_active_user)
+):
+    """Send a message to the chatbot and stream the response as server-sent events.
+    
+    Emits a metadata event once the SQL has run, token events as the reply
+    is generated and a done event with the full ChatResponse.
+    """
+    if refresh_schema and request.datasource_id:
+        chatbot_service.invalidate_schema(request.datasource_id)
+    async def event_stream():
+        # Request-scoped sessions are closed before a streaming body is sent,
+        # so the stream owns its session
+        db = SessionLocal()
+        try:
+            async for event in chatbot_service.aprocess_message_stream(
+                user=current_user,
+                message=request.message,
+                conversation_id=request.conversation_id,
+                datasource_id=request.datasource_id,
+                db=db
+            ):
+                name = event.pop("event")
+                if name == "done":
+                    response = ChatResponse(**event)
+                    await _broadcast_exchange(response, current_user.id, request.message)
+                    event = response.model_dump(mode="json")
+                yield f"event: {name}\ndata: {json.dumps(event, default=str)}\n\n"
+        except Exception as e:
+            db.rollback()
+            yield f"event: error\ndata: {json.dumps({'detail': str(e)})}\n\n"
+        finally:
+            db.close()
+    
+    return StreamingResponse(event_stream(), media_type="text/event-stream")
+
+
+async def _broadcast_exchange(response: ChatResponse, user_id: int, message: str):
+    """Broadcast a user message and the assistant reply to conversation subscribers."""
+    # Broadcast user message first
+    from app.api.v1.endpoints.websocket import broadcast_user_message
+    await broadcast_user_message(
+        response.conversation_id,
+        user_id,
+        message
+    )
+    
+    # Broadcast assistant response to all subscribers
+    await broadcast_chat_message(
+        response.conversation_id,
+        {
+            "id": response.message_id,
+            "role": "assistant",
+            "content": response.message,
+            "metadata": {
+                "sql_query": response.sql_query,
+                "execution_result": response.execution_result,
+                "visualization_suggestion": response.visualization_suggestion,
+                "statistical_summary": response.statistical_summary,
+                "insights": response.insights,
+                "suggested_queries": response.suggested_queries,
+            },
+            "created_at": str(datetime.utcnow()),
+        }
+    )
+
+
 @router.get("/conversations", response_model=List[ConversationList])
 def list_conversations(
     skip: int = 0,
@@ -151,6 +200,56 @@ def get_conversation(
     return conversation
 
 
+@router.get("/conversations/{conversation_id}/messages", response_model=List[ChatMessageLite])
+def list_conversation_messages(
+    conversation_id: int,
+    skip: int = 0,
+    limit: int = 100,
+    before_id: Optional[int] = Query(None, description="Return the messages preceding this message id"),
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_active_user)
+):
+    """List messages of a conversation without their metadata payloads.
+    
+    Pass ``before_id`` (the oldest message id already loaded) to page
+    backwards through long conversations without an OFFSET scan.
+    """
+    conversation = db.query(Conversation.id).filter(
+        Conversation.id == conversation_id,
+        Conversation.user_id == current_user.id
+    ).first()
+    
+    if not conversation:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Conversation not found"
+        )
+    
+    # Project only the listed columns so the JSON metadata column is never loaded
+    query = db.query(
+        ChatMessage.id,
+        ChatMessage.conversation_id,
+        ChatMessage.role,
+        ChatMessage.content,
+        ChatMessage.created_at
+    ).filter(ChatMessage.conversation_id == conversation_id)
+    
+    if before_id is not None:
+        # Keyset page: newest `limit` messages older than the cursor, oldest first
+        messages = query.filter(ChatMessage.id < before_id)\
+            .order_by(desc(ChatMessage.created_at), desc(ChatMessage.id))\
+            .limit(limit)\
+            .all()
+        return messages[::-1]
+    
+    messages = query.order_by(ChatMessage.created_at)\
+        .offset(skip)\
+        .limit(limit)\
+        .all()
+    
+    return messages
+
+
 @router.delete("/conversations/{conversation_id}", status_code=status.HTTP_204_NO_CONTENT)
 def delete_conversation(
     conversation_id: int,
@@ -9,11 +9,10 @@ from app.models.user import User
 from app.schemas.datasource import DataSource as DataSourceSchema, DataSourceCreate, DataSourceUpdate
 from app.api.v1.deps import get_current_active_user
 from app.services.file_upload import FileUploadService
-from app.services.analytics import AnalyticsEngine
+from app.services.analytics import analytics_engine
 
 router = APIRouter()
 file_upload_service = FileUploadService()
-analytics_engine = AnalyticsEngine()
 
 
 @router.post("/", response_model=DataSourceSchema, status_code=status.HTTP_201_CREATED)
@@ -175,6 +174,9 @@ def update_datasource(
     
     db.commit()
     db.refresh(datasource)
+    analytics_engine.invalidate(datasource_id)
+    # Drop the pooled engine and cached schema built from the old settings
+    analytics_engine.db_connector.close_connection(datasource_id)
     return datasource
 
 
@@ -197,4 +199,7 @@ def delete_datasource(
     
     db.delete(datasource)
     db.commit()
+    analytics_engine.invalidate(datasource_id)
+    # Release the pooled engine and cached schema of the removed source
+    analytics_engine.db_connector.close_connection(datasource_id)
     return None
@@ -36,6 +36,10 @@ class Settings(BaseSettings):
     LLM_BASE_URL: str = ""  # For open-source LLMs like Ollama
     CHATBOT_MAX_CONTEXT_MESSAGES: int = 10
     CHATBOT_TEMPERATURE: float = 0.3
+    CHATBOT_SQL_CACHE_SIZE: int = 1024  # Generated SQL kept in process
+    CHATBOT_SQL_CACHE_TTL: int = 3600  # Generated SQL TTL in Redis (seconds)
+    CHATBOT_MAX_CONCURRENCY: int = 8  # Conversations processed at once by batch jobs
+    CHATBOT_MAX_RESULT_ROWS: int = 10000  # Rows read from a chat query's result
 
     @property
     def SQLALCHEMY_DATABASE_URI(self) -> str:
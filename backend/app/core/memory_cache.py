@@ -0,0 +1,65 @@
+"""
+In-process LRU cache with optional expiry.
+Used for per-worker caches that are too hot or too process-specific for Redis.
+"""
+from collections import OrderedDict
+import threading
+import time
+from typing import Any, Callable, Hashable, List, Optional
+
+
+class MemoryCache:
+    """Thread-safe LRU cache whose entries can expire after a TTL.
+
+    Past ``maxsize`` entries the least recently used one is evicted; an
+    entry older than ``ttl`` seconds is dropped when it is next read.
+    Either bound may be None to disable it.
+    """
+
+    def __init__(self, maxsize: Optional[int] = None, ttl: Optional[float] = None):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        # key -> (stored at, value), least recently used first
+        self._entries: "OrderedDict[Hashable, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        """Return the cached value and mark it recently used, or None."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            stored_at, value = entry
+            if self.ttl is not None and time.monotonic() - stored_at >= self.ttl:
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key: Hashable, value: Any) -> None:
+        """Store a value, evicting the least recently used entries past maxsize."""
+        with self._lock:
+            self._entries[key] = (time.monotonic(), value)
+            self._entries.move_to_end(key)
+            if self.maxsize is not None:
+                while len(self._entries) > self.maxsize:
+                    self._entries.popitem(last=False)
+
+    def invalidate(self, predicate: Callable[[Hashable], bool]) -> None:
+        """Drop every entry whose key matches the predicate."""
+        with self._lock:
+            for key in [key for key in self._entries if predicate(key)]:
+                del self._entries[key]
+
+    def clear(self) -> None:
+        """Drop every entry."""
+        with self._lock:
+            self._entries.clear()
+
+    def values(self) -> List[Any]:
+        """Snapshot of the cached values, least recently used first."""
+        with self._lock:
+            return [value for _, value in self._entries.values()]
+
+    def __len__(self) -> int:
+        return len(self._entries)
@@ -10,6 +10,13 @@ from app.core.config import settings
 from app.core.rate_limit import limiter
 from app.api.v1.endpoints import health, auth, users, datasources, dashboards, widgets, upload, database_connections, rest_api, analytics, chatbot, websocket, notifications
 
+try:
+    # Optional: native JSON encoder for API responses, much faster on large query results
+    import orjson  # noqa: F401
+    from fastapi.responses import ORJSONResponse as DefaultResponse
+except ImportError:
+    DefaultResponse = JSONResponse
+
 
 def create_application() -> FastAPI:
     app = FastAPI(
@@ -45,6 +52,7 @@ REST API for dashboards, data sources, analytics, and AI-powered chatbot.
         ],
         contact={"name": "IntelliBI", "url": "https://github.com/muktaBlueitek/intellibi"},
         license_info={"name": "MIT"},
+        default_response_class=DefaultResponse,
     )
 
     # Configure CORS
@@ -76,6 +84,9 @@ REST API for dashboards, data sources, analytics, and AI-powered chatbot.
     app.include_router(websocket.router, prefix="/api/v1", tags=["websocket"])
     app.include_router(notifications.router, prefix="/api/v1/notifications", tags=["notifications"])
 
+    # Release pooled LLM provider connections
+    app.add_event_handler("shutdown", chatbot.chatbot_service.aclose)
+
     # Global exception handlers
     @app.exception_handler(RequestValidationError)
     async def validation_exception_handler(request: Request, exc: RequestValidationError):
@@ -1,4 +1,5 @@
 from sqlalchemy import Column, Integer, String, Text, DateTime, ForeignKey, JSON, Float
+from sqlalchemy.dialects.postgresql import JSONB
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
 
@@ -29,7 +30,7 @@ class ChatMessage(Base):
     conversation_id = Column(Integer, ForeignKey("conversations.id"), nullable=False, index=True)
     role = Column(String, nullable=False)  # 'user' or 'assistant'
     content = Column(Text, nullable=False)
-    message_metadata = Column("metadata", JSON, nullable=True)  # Store SQL queries, execution results, etc.
+    message_metadata = Column("metadata", JSON().with_variant(JSONB(), "postgresql"), nullable=True)  # Store SQL queries, execution results, etc.
     created_at = Column(DateTime(timezone=True), server_default=func.now())
 
     # Relationships
@@ -30,7 +30,7 @@ class Notification(Base):
     message = Column(Text, nullable=False)
     
     # Optional metadata (e.g., link to dashboard, action buttons)
-    metadata = Column(JSON, nullable=True)
+    notification_metadata = Column("metadata", JSON, nullable=True)
     
     # Read status
     is_read = Column(Boolean, default=False, index=True)
@@ -5,7 +5,7 @@ from app.schemas.dashboard import Dashboard, DashboardCreate, DashboardUpdate
 from app.schemas.widget import Widget, WidgetCreate, WidgetUpdate
 from app.schemas.chatbot import (
     ChatRequest, ChatResponse, Conversation, ConversationCreate, ConversationList,
-    ChatMessage, ChatMessageCreate, QueryHistory, QueryHistoryFilter, QueryHistoryStats,
+    ChatMessage, ChatMessageCreate, ChatMessageLite, QueryHistory, QueryHistoryFilter, QueryHistoryStats,
     VisualizationSuggestion, StatisticalSummary, QueryInsights
 )
 
@@ -16,7 +16,7 @@ __all__ = [
     "Dashboard", "DashboardCreate", "DashboardUpdate",
     "Widget", "WidgetCreate", "WidgetUpdate",
     "ChatRequest", "ChatResponse", "Conversation", "ConversationCreate", "ConversationList",
-    "ChatMessage", "ChatMessageCreate", "QueryHistory", "QueryHistoryFilter", "QueryHistoryStats",
+    "ChatMessage", "ChatMessageCreate", "ChatMessageLite", "QueryHistory", "QueryHistoryFilter", "QueryHistoryStats",
     "VisualizationSuggestion", "StatisticalSummary", "QueryInsights",
 ]
 
@@ -0,0 +1,14 @@
+from typing import Any, Annotated
+from datetime import datetime
+from pydantic import BeforeValidator
+
+
+def _to_epoch_seconds(value: Any) -> Any:
+    """Convert datetimes to integer Unix timestamps; pass anything else through."""
+    if isinstance(value, datetime):
+        return int(value.timestamp())
+    return value
+
+
+# Integer epoch seconds on the wire, accepting datetimes loaded from the ORM
+EpochSeconds = Annotated[int, BeforeValidator(_to_epoch_seconds)]
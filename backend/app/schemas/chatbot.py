@@ -2,8 +2,12 @@ from typing import Optional, Dict, Any, List
 from datetime import datetime
 from pydantic import BaseModel, Field
 
+from app.schemas._base import EpochSeconds
+
 
 class ChatMessageBase(BaseModel):
+    __slots__ = ()
+
     role: str
     content: str
     message_metadata: Optional[Dict[str, Any]] = None
@@ -14,6 +18,8 @@ class ChatMessageCreate(ChatMessageBase):
 
 
 class ChatMessage(ChatMessageBase):
+    __slots__ = ()
+
     id: int
     conversation_id: int
     created_at: datetime
@@ -23,6 +29,20 @@ class ChatMessage(ChatMessageBase):
         populate_by_name = True
 
 
+class ChatMessageLite(BaseModel):
+    """Message row for bulk listings: no metadata payload, epoch-second timestamps."""
+    __slots__ = ()
+
+    id: int
+    conversation_id: int
+    role: str
+    content: str
+    created_at: EpochSeconds
+
+    class Config:
+        from_attributes = True
+
+
 class ConversationBase(BaseModel):
     title: Optional[str] = None
 
@@ -43,6 +63,8 @@ class Conversation(ConversationBase):
 
 
 class ConversationList(BaseModel):
+    __slots__ = ()
+
     id: int
     user_id: int
     title: Optional[str] = None
@@ -67,6 +89,8 @@ class VisualizationSuggestion(BaseModel):
 
 
 class StatisticalSummary(BaseModel):
+    __slots__ = ()
+
     column: str
     mean: Optional[float] = None
     median: Optional[float] = None
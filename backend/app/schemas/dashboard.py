@@ -1,9 +1,8 @@
-from typing import Optional, Dict, Any, List, TYPE_CHECKING
+from typing import Optional, Dict, Any, List
 from datetime import datetime
 from pydantic import BaseModel
 
-if TYPE_CHECKING:
-    from app.schemas.widget import Widget as WidgetSchema
+from app.schemas.widget import Widget as WidgetSchema
 
 
 class DashboardBase(BaseModel):
@@ -30,7 +29,7 @@ class Dashboard(DashboardBase):
     id: int
     owner_id: int
     version: int
-    widgets: List["WidgetSchema"] = []
+    widgets: List[WidgetSchema] = []
     created_at: datetime
     updated_at: Optional[datetime] = None
 
@@ -49,6 +48,8 @@ class DashboardShareUpdate(BaseModel):
 
 
 class DashboardShare(BaseModel):
+    __slots__ = ()
+
     id: int
     dashboard_id: int
     user_id: int
@@ -67,6 +68,8 @@ class DashboardVersionCreate(BaseModel):
 
 
 class DashboardVersion(BaseModel):
+    __slots__ = ()
+
     id: int
     dashboard_id: int
     version_number: int
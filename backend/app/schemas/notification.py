@@ -1,6 +1,6 @@
 from typing import Optional, Dict, Any
 from datetime import datetime
-from pydantic import BaseModel
+from pydantic import BaseModel, Field, AliasChoices
 
 from app.models.notification import NotificationType
 
@@ -17,6 +17,11 @@ class NotificationCreate(NotificationBase):
 
 
 class Notification(NotificationBase):
+    # Read from the ORM attribute first; `metadata` on the model is the declarative MetaData
+    metadata: Optional[Dict[str, Any]] = Field(
+        default=None,
+        validation_alias=AliasChoices("notification_metadata", "metadata"),
+    )
     id: int
     user_id: int
     is_read: bool
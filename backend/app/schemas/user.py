@@ -43,4 +43,3 @@ class User(UserBase):
 
     class Config:
         from_attributes = True
-
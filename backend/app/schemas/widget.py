@@ -5,6 +5,8 @@ from app.models.widget import WidgetType
 
 
 class WidgetBase(BaseModel):
+    __slots__ = ()
+
     name: str
     type: WidgetType
     description: Optional[str] = None
@@ -34,6 +36,8 @@ class WidgetUpdate(BaseModel):
 
 
 class Widget(WidgetBase):
+    __slots__ = ()
+
     id: int
     dashboard_id: int
     created_at: datetime
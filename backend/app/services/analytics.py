@@ -1,14 +1,16 @@
-from typing import Dict, Any, Optional, List, Union
-from datetime import datetime, timedelta
+from typing import Dict, Any, NamedTuple, Optional, List
+import copy
 from enum import Enum
+from functools import lru_cache
+import re
 import pandas as pd
 import numpy as np
-from sqlalchemy import text
-from sqlalchemy.engine import Connection
+from pandas.tseries.frequencies import to_offset
 
+from app.core.memory_cache import MemoryCache
 from app.models.datasource import DataSource, DataSourceType
 from app.services.database_connector import DatabaseConnector
-from app.services.file_upload import FileUploadService
+from app.services.file_upload import FileUploadService, downcast_numeric
 from app.services.rest_api_connector import RestApiConnector
 
 
@@ -36,6 +38,58 @@ class TimeInterval(str, Enum):
     YEAR = "year"
 
 
+# Pandas reduction name for each aggregation function
+_AGG_TO_PANDAS: Dict[AggregationFunction, str] = {
+    AggregationFunction.SUM: "sum",
+    AggregationFunction.AVG: "mean",
+    AggregationFunction.COUNT: "count",
+    AggregationFunction.MIN: "min",
+    AggregationFunction.MAX: "max",
+    AggregationFunction.STD: "std",
+    AggregationFunction.VAR: "var",
+    AggregationFunction.MEDIAN: "median",
+}
+_PANDAS_TO_AGG: Dict[str, str] = {pd_func: func.value for func, pd_func in _AGG_TO_PANDAS.items()}
+
+# SQL aggregate for each aggregation function that databases implement
+# natively (MEDIAN has no portable equivalent)
+_AGG_TO_SQL: Dict[AggregationFunction, str] = {
+    AggregationFunction.SUM: "SUM",
+    AggregationFunction.AVG: "AVG",
+    AggregationFunction.COUNT: "COUNT",
+    AggregationFunction.MIN: "MIN",
+    AggregationFunction.MAX: "MAX",
+    AggregationFunction.STD: "STDDEV_SAMP",
+    AggregationFunction.VAR: "VAR_SAMP",
+}
+# SQL function name emitted by QueryBuilder for every aggregation function
+_AGG_SQL_NAME: Dict[AggregationFunction, str] = {
+    func: _AGG_TO_SQL.get(func, func.value.upper()) for func in AggregationFunction
+}
+
+# Pandas offset alias for each time-series interval
+_FREQ: Dict[TimeInterval, str] = {
+    TimeInterval.SECOND: "s",
+    TimeInterval.MINUTE: "min",
+    TimeInterval.HOUR: "h",
+    TimeInterval.DAY: "D",
+    TimeInterval.WEEK: "W",
+    TimeInterval.MONTH: "ME",
+    TimeInterval.QUARTER: "QE",
+    TimeInterval.YEAR: "YE",
+}
+
+# Intervals with a fixed width that can be bucketed with dt.floor
+_FIXED_INTERVALS = frozenset({
+    TimeInterval.SECOND,
+    TimeInterval.MINUTE,
+    TimeInterval.HOUR,
+    TimeInterval.DAY,
+})
+# Result-column suffixes that resample reports as 0 (not NaN) for empty buckets
+_ZERO_ON_EMPTY = ("_sum", "count")
+
+
 class FilterOperator(str, Enum):
     """Filter operators for WHERE clauses."""
     EQ = "eq"  # equals
@@ -44,7 +98,7 @@ class FilterOperator(str, Enum):
     GTE = "gte"  # greater than or equal
     LT = "lt"  # less than
     LTE = "lte"  # less than or equal
-    LIKE = "like"  # like pattern
+    LIKE = "like"  # contains substring; a LIKE pattern when the filter sets "pattern"
     IN = "in"  # in list
     NOT_IN = "not_in"  # not in list
     IS_NULL = "is_null"  # is null
@@ -52,12 +106,159 @@ class FilterOperator(str, Enum):
     BETWEEN = "between"  # between two values
 
 
+# Identifier quote character for each SQL dialect QueryBuilder targets
+_IDENTIFIER_QUOTE: Dict[DataSourceType, str] = {
+    DataSourceType.POSTGRESQL: '"',
+    DataSourceType.MYSQL: "`",
+}
+
+# MySQL has no date_trunc; truncate by formatting or date arithmetic
+_MYSQL_DATE_TRUNC: Dict[TimeInterval, str] = {
+    TimeInterval.SECOND: "DATE_FORMAT({col}, '%Y-%m-%d %H:%i:%s')",
+    TimeInterval.MINUTE: "DATE_FORMAT({col}, '%Y-%m-%d %H:%i:00')",
+    TimeInterval.HOUR: "DATE_FORMAT({col}, '%Y-%m-%d %H:00:00')",
+    TimeInterval.DAY: "DATE({col})",
+    TimeInterval.WEEK: "DATE_SUB(DATE({col}), INTERVAL WEEKDAY({col}) DAY)",
+    TimeInterval.MONTH: "DATE_FORMAT({col}, '%Y-%m-01')",
+    TimeInterval.QUARTER: "MAKEDATE(YEAR({col}), 1) + INTERVAL (QUARTER({col}) - 1) QUARTER",
+    TimeInterval.YEAR: "MAKEDATE(YEAR({col}), 1)",
+}
+
+
+def _dialect_date_trunc(interval: TimeInterval, column: str, dialect: DataSourceType) -> str:
+    """SQL expression truncating an already-quoted column to an interval."""
+    if dialect == DataSourceType.MYSQL:
+        return _MYSQL_DATE_TRUNC[interval].format(col=column)
+    return f"date_trunc('{interval.value}', {column})"
+
+
+def _quote_identifier(name: str, quote: str) -> str:
+    """Quote an identifier, doubling any embedded quote characters."""
+    escaped = name.replace(quote, quote * 2)
+    return f"{quote}{escaped}{quote}"
+
+
+def _fill_empty_buckets(result: pd.DataFrame, freq: str) -> pd.DataFrame:
+    """Reindex a time-indexed aggregate onto every bucket in its range.
+    
+    Empty buckets come back as resample returns them: zero for sums and
+    counts, NaN for every other aggregation.
+    """
+    if result.empty:
+        return result
+    observed = result.index
+    result = result.reindex(
+        pd.date_range(observed.min(), observed.max(), freq=freq, name=observed.name),
+        fill_value=0,
+    )
+    nan_columns = [col for col in result.columns if not col.endswith(_ZERO_ON_EMPTY)]
+    if nan_columns:
+        result.loc[~result.index.isin(observed), nan_columns] = np.nan
+    return result
+
+
+def _sql_bucket_labels(buckets: pd.Series, interval: TimeInterval) -> pd.Series:
+    """Convert SQL-truncated timestamps to the bucket labels pandas uses.
+    
+    MySQL returns sub-day buckets as formatted strings, and SQL labels
+    calendar periods by their first day while resample labels weeks,
+    months, quarters and years by their last day.
+    """
+    buckets = pd.to_datetime(buckets)
+    if interval not in _FIXED_INTERVALS:
+        # A zero-length offset rolls each period start forward to its label
+        buckets = buckets + to_offset(_FREQ[interval]) * 0
+    return buckets
+
+
+# Raw SQL result cache bounds
+_RESULT_CACHE_TTL = 60  # seconds
+_RESULT_CACHE_MAXSIZE = 256
+
+_WS_RE = re.compile(r"\s+")
+_KEYWORD_RE = re.compile(r"\b(SELECT|LIMIT|GROUP\s+BY|UNION|OFFSET)\b", re.IGNORECASE)
+_OFFSET_RE = re.compile(r"\bOFFSET\b", re.IGNORECASE)
+_LIKE_SPECIAL_RE = re.compile(r"[\\%_]")
+_LIKE_TOKEN_RE = re.compile(r"\\.?|[%_]|[^\\%_]+", re.DOTALL)
+
+# Separators used when assembling SQL
+_COMMA = ", "
+_AND = " AND "
+_SPACE = " "
+
+
+class Aggregation(NamedTuple):
+    """Aggregate expression selected by a QueryBuilder."""
+    column: str
+    function: AggregationFunction
+    alias: str
+
+
+class Join(NamedTuple):
+    """JOIN clause added to a QueryBuilder."""
+    table: str
+    on: str
+    type: str
+
+
+# Comparison ufuncs for filters evaluated directly on numeric ndarrays
+_NUMERIC_COMPARISONS = {
+    FilterOperator.EQ.value: np.equal,
+    FilterOperator.NE.value: np.not_equal,
+    FilterOperator.GT.value: np.greater,
+    FilterOperator.GTE.value: np.greater_equal,
+    FilterOperator.LT.value: np.less,
+    FilterOperator.LTE.value: np.less_equal,
+}
+
+
+def _is_number(value: Any) -> bool:
+    return isinstance(value, (int, float, np.number)) and not isinstance(value, bool)
+
+
+def _is_numeric_filter(operator: str, value: Any) -> bool:
+    """Whether a filter is a numeric comparison that numpy can evaluate."""
+    if operator == FilterOperator.BETWEEN.value:
+        return isinstance(value, (list, tuple)) and len(value) == 2 and all(map(_is_number, value))
+    return operator in _NUMERIC_COMPARISONS and _is_number(value)
+
+
+def _like_substring(value: str) -> str:
+    """LIKE pattern matching ``value`` literally anywhere in a string.
+    
+    Relies on backslash being the default LIKE escape character, as it is
+    in PostgreSQL and MySQL.
+    """
+    return "%" + _LIKE_SPECIAL_RE.sub(r"\\\g<0>", value) + "%"
+
+
+@lru_cache(maxsize=256)
+def _like_to_regex(pattern: str) -> "re.Pattern[str]":
+    """Compile a SQL LIKE pattern into an equivalent full-match regex.
+    
+    ``%`` and ``_`` are wildcards and a backslash makes the next character
+    literal, as in the databases' LIKE.
+    """
+    parts = []
+    for token in _LIKE_TOKEN_RE.findall(pattern):
+        if token == "%":
+            parts.append(".*")
+        elif token == "_":
+            parts.append(".")
+        elif token.startswith("\\"):
+            parts.append(re.escape(token[1:] or token))
+        else:
+            parts.append(re.escape(token))
+    return re.compile("".join(parts), re.DOTALL)
+
+
 class QueryBuilder:
     """SQL query builder for dynamic query construction."""
     
-    def __init__(self, table_name: str):
-        """Initialize query builder with a table name."""
+    def __init__(self, table_name: str, quote: str = '"'):
+        """Initialize query builder with a table name and identifier quote character."""
         self.table_name = table_name
+        self.quote = quote
         self.select_fields: List[str] = []
         self.where_conditions: List[str] = []
         self.group_by_fields: List[str] = []
@@ -65,14 +266,25 @@ class QueryBuilder:
         self.order_by_fields: List[str] = []
         self.limit_value: Optional[int] = None
         self.offset_value: Optional[int] = None
-        self.aggregations: List[Dict[str, Any]] = []
-        self.joins: List[Dict[str, Any]] = []
+        self.sample_value: Optional[int] = None
+        self.aggregations: List[Aggregation] = []
+        self.joins: List[Join] = []
+        self.params: Dict[str, Any] = {}
     
     def select(self, *fields: str) -> "QueryBuilder":
         """Add fields to SELECT clause."""
         self.select_fields.extend(fields)
         return self
     
+    def select_expr(self, expression: str, alias: str) -> "QueryBuilder":
+        """Add a raw expression to SELECT clause under an alias."""
+        self.select_fields.append(f"{expression} AS {self.quote_identifier(alias)}")
+        return self
+    
+    def quote_identifier(self, name: str) -> str:
+        """Quote a table or column name for this builder's dialect."""
+        return _quote_identifier(name, self.quote)
+    
     def where(self, column: str, operator: FilterOperator, value: Any) -> "QueryBuilder":
         """Add WHERE condition."""
         condition = self._build_condition(column, operator, value)
@@ -87,7 +299,12 @@ class QueryBuilder:
     
     def group_by(self, *fields: str) -> "QueryBuilder":
         """Add fields to GROUP BY clause."""
-        self.group_by_fields.extend(fields)
+        self.group_by_fields.extend(map(self.quote_identifier, fields))
+        return self
+    
+    def group_by_raw(self, expression: str) -> "QueryBuilder":
+        """Add raw GROUP BY expression."""
+        self.group_by_fields.append(expression)
         return self
     
     def having(self, column: str, operator: FilterOperator, value: Any) -> "QueryBuilder":
@@ -113,6 +330,11 @@ class QueryBuilder:
         self.offset_value = offset
         return self
     
+    def sample(self, limit: int) -> "QueryBuilder":
+        """Read only the first ``limit`` rows of the table, before filtering and grouping."""
+        self.sample_value = limit
+        return self
+    
     def aggregate(
         self,
         column: str,
@@ -121,11 +343,7 @@ class QueryBuilder:
     ) -> "QueryBuilder":
         """Add aggregation function."""
         agg_name = alias or f"{function.value}_{column}"
-        self.aggregations.append({
-            "column": column,
-            "function": function,
-            "alias": agg_name
-        })
+        self.aggregations.append(Aggregation(column, function, agg_name))
         return self
     
     def join(
@@ -135,40 +353,35 @@ class QueryBuilder:
         join_type: str = "INNER"
     ) -> "QueryBuilder":
         """Add JOIN clause."""
-        self.joins.append({
-            "table": table,
-            "on": on,
-            "type": join_type
-        })
+        self.joins.append(Join(table, on, join_type))
         return self
     
     def _build_condition(self, column: str, operator: FilterOperator, value: Any) -> Optional[str]:
-        """Build SQL condition string."""
-        column_escaped = f'"{column}"'  # Escape column name
+        """Build SQL condition string, binding values as parameters."""
+        column_escaped = self.quote_identifier(column)
         
         if operator == FilterOperator.EQ:
-            return f"{column_escaped} = {self._format_value(value)}"
+            return f"{column_escaped} = {self._bind(value)}"
         elif operator == FilterOperator.NE:
-            return f"{column_escaped} != {self._format_value(value)}"
+            return f"{column_escaped} != {self._bind(value)}"
         elif operator == FilterOperator.GT:
-            return f"{column_escaped} > {self._format_value(value)}"
+            return f"{column_escaped} > {self._bind(value)}"
         elif operator == FilterOperator.GTE:
-            return f"{column_escaped} >= {self._format_value(value)}"
+            return f"{column_escaped} >= {self._bind(value)}"
         elif operator == FilterOperator.LT:
-            return f"{column_escaped} < {self._format_value(value)}"
+            return f"{column_escaped} < {self._bind(value)}"
         elif operator == FilterOperator.LTE:
-            return f"{column_escaped} <= {self._format_value(value)}"
+            return f"{column_escaped} <= {self._bind(value)}"
         elif operator == FilterOperator.LIKE:
-            return f"{column_escaped} LIKE {self._format_value(value)}"
+            return f"{column_escaped} LIKE {self._bind(value)}"
         elif operator == FilterOperator.IN:
             if isinstance(value, list):
-                values_str = ", ".join([self._format_value(v) for v in value])
-                return f"{column_escaped} IN ({values_str})"
+                # One expanding parameter keeps the SQL text independent of list length
+                return f"{column_escaped} IN {self._bind(value)}"
             return None
         elif operator == FilterOperator.NOT_IN:
             if isinstance(value, list):
-                values_str = ", ".join([self._format_value(v) for v in value])
-                return f"{column_escaped} NOT IN ({values_str})"
+                return f"{column_escaped} NOT IN {self._bind(value)}"
             return None
         elif operator == FilterOperator.IS_NULL:
             return f"{column_escaped} IS NULL"
@@ -176,84 +389,110 @@ class QueryBuilder:
             return f"{column_escaped} IS NOT NULL"
         elif operator == FilterOperator.BETWEEN:
             if isinstance(value, (list, tuple)) and len(value) == 2:
-                return f"{column_escaped} BETWEEN {self._format_value(value[0])} AND {self._format_value(value[1])}"
+                return f"{column_escaped} BETWEEN {self._bind(value[0])} AND {self._bind(value[1])}"
             return None
         return None
     
-    def _format_value(self, value: Any) -> str:
-        """Format value for SQL query."""
-        if value is None:
-            return "NULL"
-        elif isinstance(value, str):
-            # Escape single quotes
-            escaped = value.replace("'", "''")
-            return f"'{escaped}'"
-        elif isinstance(value, (int, float)):
-            return str(value)
-        elif isinstance(value, (datetime, pd.Timestamp)):
-            return f"'{value.isoformat()}'"
-        elif isinstance(value, bool):
-            return "TRUE" if value else "FALSE"
-        else:
-            return f"'{str(value)}'"
+    def _bind(self, value: Any) -> str:
+        """Register a bound parameter and return its placeholder."""
+        name = f"p{len(self.params)}"
+        self.params[name] = value
+        return f":{name}"
+    
+    def _state(self) -> tuple:
+        """Snapshot the builder's fields as a hashable tuple."""
+        return (
+            self.table_name,
+            self.quote,
+            tuple(self.select_fields),
+            tuple(self.where_conditions),
+            tuple(self.group_by_fields),
+            tuple(self.having_conditions),
+            tuple(self.order_by_fields),
+            self.limit_value,
+            self.offset_value,
+            self.sample_value,
+            tuple(self.aggregations),
+            tuple(self.joins),
+        )
     
     def build(self) -> str:
-        """Build the final SQL query."""
-        query_parts = []
+        """Build the final SQL query.
         
-        # SELECT clause
-        select_parts = []
-        
-        # Add regular fields
-        if self.select_fields:
-            select_parts.extend(self.select_fields)
+        Filter values are emitted as named placeholders; pass ``params``
+        alongside the query when executing it. IN/NOT IN lists are bound
+        as a single list-valued parameter, which must be declared expanding.
+        """
+        return self._build_cached(self._state())
+    
+    @staticmethod
+    @lru_cache(maxsize=1024)
+    def _build_cached(state: tuple) -> str:
+        """Assemble the SQL for a builder state (memoized per process)."""
+        (
+            table_name,
+            quote,
+            select_fields,
+            where_conditions,
+            group_by_fields,
+            having_conditions,
+            order_by_fields,
+            limit_value,
+            offset_value,
+            sample_value,
+            aggregations,
+            joins,
+        ) = state
+        query_parts = []
         
-        # Add aggregations
-        for agg in self.aggregations:
-            func_name = agg["function"].value.upper()
-            column = f'"{agg["column"]}"'
-            alias = f'"{agg["alias"]}"'
-            select_parts.append(f"{func_name}({column}) AS {alias}")
+        # SELECT clause: regular fields followed by aggregations
+        select_parts = list(select_fields)
+        select_parts.extend(
+            f"{_AGG_SQL_NAME[agg.function]}({_quote_identifier(agg.column, quote)}) "
+            f"AS {_quote_identifier(agg.alias, quote)}"
+            for agg in aggregations
+        )
         
         # If no fields specified, select all
-        if not select_parts:
-            select_parts.append("*")
+        query_parts.append("SELECT " + (_COMMA.join(select_parts) if select_parts else "*"))
         
-        query_parts.append(f"SELECT {', '.join(select_parts)}")
-        
-        # FROM clause
-        query_parts.append(f'FROM "{self.table_name}"')
+        # FROM clause; a sampled table is read through a limited subquery
+        # aliased back to the table name so column references still resolve
+        table = _quote_identifier(table_name, quote)
+        if sample_value is not None:
+            query_parts.append(f"FROM (SELECT * FROM {table} LIMIT {sample_value}) AS {table}")
+        else:
+            query_parts.append(f"FROM {table}")
         
         # JOIN clauses
-        for join in self.joins:
-            query_parts.append(f"{join['type']} JOIN {join['table']} ON {join['on']}")
+        for join in joins:
+            query_parts.append(f"{join.type} JOIN {join.table} ON {join.on}")
         
         # WHERE clause
-        if self.where_conditions:
-            query_parts.append(f"WHERE {' AND '.join(self.where_conditions)}")
+        if where_conditions:
+            query_parts.append("WHERE " + _AND.join(where_conditions))
         
         # GROUP BY clause
-        if self.group_by_fields:
-            group_fields = [f'"{field}"' for field in self.group_by_fields]
-            query_parts.append(f"GROUP BY {', '.join(group_fields)}")
+        if group_by_fields:
+            query_parts.append("GROUP BY " + _COMMA.join(group_by_fields))
         
         # HAVING clause
-        if self.having_conditions:
-            query_parts.append(f"HAVING {' AND '.join(self.having_conditions)}")
+        if having_conditions:
+            query_parts.append("HAVING " + _AND.join(having_conditions))
         
         # ORDER BY clause
-        if self.order_by_fields:
-            query_parts.append(f"ORDER BY {', '.join(self.order_by_fields)}")
+        if order_by_fields:
+            query_parts.append("ORDER BY " + _COMMA.join(order_by_fields))
         
         # LIMIT clause
-        if self.limit_value is not None:
-            query_parts.append(f"LIMIT {self.limit_value}")
+        if limit_value is not None:
+            query_parts.append(f"LIMIT {limit_value}")
         
         # OFFSET clause
-        if self.offset_value is not None:
-            query_parts.append(f"OFFSET {self.offset_value}")
+        if offset_value is not None:
+            query_parts.append(f"OFFSET {offset_value}")
         
-        return " ".join(query_parts)
+        return _SPACE.join(query_parts)
 
 
 class AnalyticsEngine:
@@ -264,15 +503,33 @@ class AnalyticsEngine:
         self.db_connector = DatabaseConnector()
         self.file_upload_service = FileUploadService()
         self.rest_api_connector = RestApiConnector()
+        # (stripped SQL, datasource id, max_rows) -> query result
+        self._result_cache = MemoryCache(maxsize=_RESULT_CACHE_MAXSIZE, ttl=_RESULT_CACHE_TTL)
     
     def get_data(
+        self,
+        datasource: DataSource,
+        password: Optional[str] = None,
+        limit: Optional[int] = None,
+        table_name: Optional[str] = None,
+        downcast: bool = False
+    ) -> pd.DataFrame:
+        """Get data from a data source as pandas DataFrame.
+        
+        With ``downcast`` numeric columns are narrowed to the smallest dtype
+        that holds their values, shrinking later filter/group-by passes.
+        """
+        df = self._load_data(datasource, password=password, limit=limit, table_name=table_name)
+        return downcast_numeric(df) if downcast else df
+    
+    def _load_data(
         self,
         datasource: DataSource,
         password: Optional[str] = None,
         limit: Optional[int] = None,
         table_name: Optional[str] = None
     ) -> pd.DataFrame:
-        """Get data from a data source as pandas DataFrame."""
+        """Load a data source into a DataFrame with pandas' default dtypes."""
         if datasource.type == DataSourceType.FILE:
             # Load from file
             if not datasource.file_path:
@@ -319,17 +576,170 @@ class AnalyticsEngine:
         self,
         datasource: DataSource,
         query: str,
-        password: Optional[str] = None
+        password: Optional[str] = None,
+        max_rows: Optional[int] = None
     ) -> Dict[str, Any]:
-        """Execute a SQL query on a database data source."""
+        """Execute a SQL query on a database data source, keeping at most max_rows rows.
+        
+        Cached results are copied on the way in and out, so callers may
+        modify the returned dict and its rows freely.
+        """
         if datasource.type not in [DataSourceType.POSTGRESQL, DataSourceType.MYSQL]:
             raise ValueError("SQL queries can only be executed on database data sources")
         
-        return self.db_connector.execute_query(
+        # Only surrounding whitespace is dropped: spacing inside string
+        # literals changes what the query matches
+        stripped = query.strip()
+        is_select = stripped[:6].upper() == "SELECT" or stripped[:4].upper() == "WITH"
+        key = (stripped, datasource.id, max_rows)
+        
+        if is_select:
+            cached = self._result_cache.get(key)
+            if cached is not None:
+                return copy.deepcopy(cached)
+        
+        result = self.db_connector.execute_query(
             datasource=datasource,
             query=query,
-            password=password
+            password=password,
+            max_rows=max_rows
+        )
+        
+        if not is_select:
+            # Writes may change what any cached read would return
+            self.invalidate(datasource.id)
+        elif result.get("success"):
+            self._result_cache.set(key, copy.deepcopy(result))
+        
+        return result
+    
+    def invalidate(self, datasource_id: int) -> None:
+        """Drop cached query results for a data source."""
+        self._result_cache.invalidate(lambda key: key[1] == datasource_id)
+    
+    def aggregate_data_source(
+        self,
+        datasource: DataSource,
+        group_by: Optional[List[str]] = None,
+        aggregations: Optional[Dict[str, List[AggregationFunction]]] = None,
+        filters: Optional[List[Dict[str, Any]]] = None,
+        time_column: Optional[str] = None,
+        interval: Optional[TimeInterval] = None,
+        password: Optional[str] = None,
+        limit: Optional[int] = None,
+        table_name: Optional[str] = None
+    ) -> pd.DataFrame:
+        """Filter and aggregate a data source, pushing the work into SQL when possible.
+        
+        PostgreSQL and MySQL sources are reduced by the database and only
+        the aggregated (and time-bucketed) rows are fetched. Every other
+        source is loaded and processed with the pandas pipeline.
+        
+        Both paths return the same frame: ``limit`` caps the rows read
+        before filtering and aggregating, unknown filter operators are
+        skipped, rows are ordered by the time bucket and group columns,
+        and time buckets are timestamps labelled and filled the way
+        ``process_time_series`` does. Remaining differences in the SQL
+        path: columns missing from the table raise a database error
+        instead of being ignored, and numeric results keep the types the
+        driver returns (e.g. ``Decimal`` sums from PostgreSQL).
+        """
+        if aggregations is None:
+            aggregations = {}
+        if not aggregations and not group_by and not time_column:
+            return pd.DataFrame()
+        
+        pushdown = (
+            datasource.type in _IDENTIFIER_QUOTE
+            and all(func in _AGG_TO_SQL for functions in aggregations.values() for func in functions)
         )
+        if pushdown:
+            if not table_name and datasource.connection_config:
+                table_name = datasource.connection_config.get("table_name")
+            if not table_name:
+                raise ValueError("Table name must be specified for database data sources")
+            
+            builder = QueryBuilder(table_name, quote=_IDENTIFIER_QUOTE[datasource.type])
+            
+            interval = interval or TimeInterval.DAY
+            if time_column:
+                # Bucket timestamps in the database; label the bucket with the time column
+                bucket = _dialect_date_trunc(interval, builder.quote_identifier(time_column), datasource.type)
+                builder.select_expr(bucket, time_column).group_by_raw(bucket).order_by(bucket)
+                builder.where(time_column, FilterOperator.IS_NOT_NULL, None)
+            
+            if group_by:
+                builder.select(*map(builder.quote_identifier, group_by)).group_by(*group_by)
+                for column in group_by:
+                    builder.order_by(builder.quote_identifier(column))
+            
+            for filter_item in filters or []:
+                try:
+                    operator = FilterOperator(filter_item.get("operator"))
+                except ValueError:
+                    # filter_data ignores operators it does not know
+                    continue
+                value = filter_item.get("value")
+                if operator == FilterOperator.LIKE and not filter_item.get("pattern"):
+                    # Same rule as filter_data: a literal substring unless a pattern is asked for
+                    value = _like_substring(str(value))
+                builder.where(filter_item.get("column"), operator, value)
+            
+            for column, functions in aggregations.items():
+                for func in dict.fromkeys(functions):
+                    builder.aggregate(column, func, alias=f"{column}_{func.value}")
+            
+            if not aggregations and (group_by or time_column):
+                builder.select_expr("COUNT(*)", "count")
+            
+            if limit:
+                builder.sample(limit)
+            
+            result = self.db_connector.execute_query_dataframe(
+                datasource=datasource,
+                query=builder.build(),
+                password=password,
+                params=builder.params
+            )
+            if time_column:
+                result[time_column] = _sql_bucket_labels(result[time_column], interval)
+                if not group_by:
+                    result = _fill_empty_buckets(
+                        result.set_index(time_column), _FREQ[interval]
+                    ).reset_index()
+            return result
+        
+        df = self.get_data(datasource, password=password, limit=limit, table_name=table_name)
+        if filters:
+            df = self.filter_data(df, filters)
+        if time_column:
+            return self.process_time_series(
+                df,
+                time_column=time_column,
+                interval=interval or TimeInterval.DAY,
+                aggregations=aggregations or None,
+                group_by=group_by
+            )
+        return self.aggregate_data(df, group_by=group_by, aggregations=aggregations or None)
+    
+    @staticmethod
+    def _build_agg_map(
+        df: pd.DataFrame,
+        aggregations: Optional[Dict[str, List[AggregationFunction]]]
+    ) -> Dict[str, List[str]]:
+        """Collect the pandas functions requested per existing column.
+        
+        Every function for a column is passed to a single agg() call so the
+        column is reduced in one pandas dispatch.
+        """
+        agg_map: Dict[str, List[str]] = {}
+        for column, functions in (aggregations or {}).items():
+            if column not in df.columns:
+                continue
+            pd_funcs = [_AGG_TO_PANDAS[func] for func in functions if func in _AGG_TO_PANDAS]
+            if pd_funcs:
+                agg_map[column] = list(dict.fromkeys(pd_funcs))
+        return agg_map
     
     def aggregate_data(
         self,
@@ -338,68 +748,38 @@ class AnalyticsEngine:
         aggregations: Optional[Dict[str, List[AggregationFunction]]] = None
     ) -> pd.DataFrame:
         """Perform data aggregation on a DataFrame."""
-        if aggregations is None:
-            aggregations = {}
+        agg_map = self._build_agg_map(df, aggregations)
         
         if group_by:
-            # Group by specified columns
-            grouped = df.groupby(group_by)
+            # Group by specified columns; string keys are dictionary-encoded
+            # once so grouping hashes integer codes instead of Python objects
+            keys = [
+                df[column].astype("category") if df[column].dtype == object else column
+                for column in group_by
+            ]
+            grouped = df.groupby(keys, observed=True)
             
-            # Apply aggregations
-            agg_dict = {}
-            for column, functions in aggregations.items():
-                if column not in df.columns:
-                    continue
-                
-                for func in functions:
-                    func_name = func.value
-                    if func_name == "sum":
-                        agg_dict[column] = "sum"
-                    elif func_name == "avg":
-                        agg_dict[column] = "mean"
-                    elif func_name == "count":
-                        agg_dict[column] = "count"
-                    elif func_name == "min":
-                        agg_dict[column] = "min"
-                    elif func_name == "max":
-                        agg_dict[column] = "max"
-                    elif func_name == "std":
-                        agg_dict[column] = "std"
-                    elif func_name == "var":
-                        agg_dict[column] = "var"
-                    elif func_name == "median":
-                        agg_dict[column] = "median"
-            
-            if agg_dict:
-                result = grouped.agg(agg_dict)
+            if agg_map:
+                result = grouped.agg(agg_map)
+                result.columns = [
+                    f"{column}_{_PANDAS_TO_AGG[pd_func]}" for column, pd_func in result.columns
+                ]
                 result = result.reset_index()
             else:
                 result = grouped.size().reset_index(name="count")
         else:
             # No grouping, aggregate entire DataFrame
-            result = pd.DataFrame()
-            for column, functions in aggregations.items():
-                if column not in df.columns:
-                    continue
-                
-                for func in functions:
-                    func_name = func.value
-                    if func_name == "sum":
-                        result[f"{column}_sum"] = [df[column].sum()]
-                    elif func_name == "avg":
-                        result[f"{column}_avg"] = [df[column].mean()]
-                    elif func_name == "count":
-                        result[f"{column}_count"] = [df[column].count()]
-                    elif func_name == "min":
-                        result[f"{column}_min"] = [df[column].min()]
-                    elif func_name == "max":
-                        result[f"{column}_max"] = [df[column].max()]
-                    elif func_name == "std":
-                        result[f"{column}_std"] = [df[column].std()]
-                    elif func_name == "var":
-                        result[f"{column}_var"] = [df[column].var()]
-                    elif func_name == "median":
-                        result[f"{column}_median"] = [df[column].median()]
+            if not agg_map:
+                return pd.DataFrame()
+            
+            # df.agg returns one row per function; pick the requested cells
+            # into a single row
+            reduced = df.agg(agg_map)
+            result = pd.DataFrame({
+                f"{column}_{_PANDAS_TO_AGG[pd_func]}": [reduced.at[pd_func, column]]
+                for column, pd_funcs in agg_map.items()
+                for pd_func in pd_funcs
+            })
         
         return result
     
@@ -408,46 +788,89 @@ class AnalyticsEngine:
         df: pd.DataFrame,
         filters: List[Dict[str, Any]]
     ) -> pd.DataFrame:
-        """Apply filters to a DataFrame."""
-        result = df.copy()
+        """Apply filters to a DataFrame.
+        
+        A LIKE filter matches rows containing its value as a literal
+        substring (``%`` and ``_`` included); with ``"pattern": True`` the
+        value is a SQL LIKE pattern matched against the whole string.
+        Returns the input frame itself when no filter applies.
+        """
+        if not filters:
+            return df
+        
+        # Combine every filter into one boolean mask and index the frame once
+        final_mask = None
         
         for filter_item in filters:
             column = filter_item.get("column")
             operator = filter_item.get("operator")
             value = filter_item.get("value")
             
-            if column not in result.columns:
+            if column not in df.columns:
                 continue
             
-            if operator == FilterOperator.EQ.value:
-                result = result[result[column] == value]
+            col = df[column]
+            mask = None
+            
+            if col.dtype.kind in "iuf" and _is_numeric_filter(operator, value):
+                # Plain numeric column: compare the ndarray directly, skipping
+                # the Series wrapping and NA handling
+                values = col.to_numpy()
+                if operator == FilterOperator.BETWEEN.value:
+                    mask = np.greater_equal(values, value[0])
+                    mask &= np.less_equal(values, value[1])
+                else:
+                    mask = _NUMERIC_COMPARISONS[operator](values, value)
+            elif operator == FilterOperator.EQ.value:
+                mask = col == value
             elif operator == FilterOperator.NE.value:
-                result = result[result[column] != value]
+                mask = col != value
             elif operator == FilterOperator.GT.value:
-                result = result[result[column] > value]
+                mask = col > value
             elif operator == FilterOperator.GTE.value:
-                result = result[result[column] >= value]
+                mask = col >= value
             elif operator == FilterOperator.LT.value:
-                result = result[result[column] < value]
+                mask = col < value
             elif operator == FilterOperator.LTE.value:
-                result = result[result[column] <= value]
+                mask = col <= value
             elif operator == FilterOperator.LIKE.value:
-                result = result[result[column].astype(str).str.contains(value, na=False, regex=False)]
+                # Columns already holding strings need no astype(str) copy
+                if not pd.api.types.is_string_dtype(col):
+                    col = col.astype(str)
+                if filter_item.get("pattern"):
+                    mask = col.str.fullmatch(_like_to_regex(str(value)), na=False)
+                else:
+                    mask = col.str.contains(str(value), na=False, regex=False)
             elif operator == FilterOperator.IN.value:
                 if isinstance(value, list):
-                    result = result[result[column].isin(value)]
+                    mask = col.isin(value)
             elif operator == FilterOperator.NOT_IN.value:
                 if isinstance(value, list):
-                    result = result[~result[column].isin(value)]
+                    mask = ~col.isin(value)
             elif operator == FilterOperator.IS_NULL.value:
-                result = result[result[column].isna()]
+                mask = col.isna()
             elif operator == FilterOperator.IS_NOT_NULL.value:
-                result = result[result[column].notna()]
+                mask = col.notna()
             elif operator == FilterOperator.BETWEEN.value:
                 if isinstance(value, (list, tuple)) and len(value) == 2:
-                    result = result[(result[column] >= value[0]) & (result[column] <= value[1])]
+                    mask = (col >= value[0]) & (col <= value[1])
+            
+            if mask is None:
+                continue
+            
+            if isinstance(mask, pd.Series):
+                mask = mask.to_numpy(dtype=bool, na_value=False)
+            if final_mask is None:
+                final_mask = mask
+            else:
+                np.logical_and(final_mask, mask, out=final_mask)
+            if not final_mask.any():
+                # Nothing can survive the AND of the remaining filters
+                return df.iloc[:0]
         
-        return result
+        if final_mask is None:
+            return df
+        return df.loc[final_mask]
     
     def sort_data(
         self,
@@ -482,100 +905,74 @@ class AnalyticsEngine:
         if time_column not in df.columns:
             raise ValueError(f"Time column '{time_column}' not found in data")
         
-        # Convert time column to datetime if not already
-        df[time_column] = pd.to_datetime(df[time_column], errors="coerce")
-        
-        # Drop rows with invalid time values
-        df = df.dropna(subset=[time_column])
-        
-        # Set time column as index
-        df_indexed = df.set_index(time_column)
-        
-        # Resample based on interval
-        if interval == TimeInterval.SECOND:
-            freq = "S"
-        elif interval == TimeInterval.MINUTE:
-            freq = "T"
-        elif interval == TimeInterval.HOUR:
-            freq = "H"
-        elif interval == TimeInterval.DAY:
-            freq = "D"
-        elif interval == TimeInterval.WEEK:
-            freq = "W"
-        elif interval == TimeInterval.MONTH:
-            freq = "M"
-        elif interval == TimeInterval.QUARTER:
-            freq = "Q"
-        elif interval == TimeInterval.YEAR:
-            freq = "Y"
-        else:
-            freq = "D"
+        # Convert time column to datetime if not already; the parsed values
+        # are kept aside so the caller's frame is never modified
+        time_values = df[time_column]
+        if not pd.api.types.is_datetime64_any_dtype(time_values):
+            time_values = pd.to_datetime(time_values, errors="coerce", cache=True)
         
-        # Group by additional columns if specified
-        if group_by:
-            # Verify all group_by columns exist
-            valid_group_by = [col for col in group_by if col in df_indexed.columns]
+        # Drop rows with invalid time values in a single masked selection
+        valid = time_values.notna().to_numpy()
+        if not valid.all():
+            df = df.loc[valid]
+            time_values = time_values[valid]
+        
+        # Bucket width for the requested interval
+        freq = _FREQ.get(interval, "D")
+        valid_group_by = [col for col in group_by or [] if col in df.columns]
+        
+        if interval in _FIXED_INTERVALS:
+            # Fixed-width buckets: floor the timestamps and group on them
+            # directly, skipping the DatetimeIndex and resample bin edges
+            bucket = time_values.dt.floor(freq)
+            grouped = df.groupby([bucket] + valid_group_by, sort=False, observed=True)
+        else:
+            # Calendar buckets have irregular edges; let resample handle them
+            df_indexed = df.drop(columns=[time_column]).set_axis(
+                pd.DatetimeIndex(time_values, name=time_column)
+            )
             if valid_group_by:
                 grouped = df_indexed.groupby([pd.Grouper(freq=freq)] + valid_group_by)
             else:
                 grouped = df_indexed.resample(freq)
-        else:
-            grouped = df_indexed.resample(freq)
         
         # Apply aggregations
-        if aggregations:
-            agg_dict = {}
-            for column, functions in aggregations.items():
-                if column not in df_indexed.columns:
-                    continue
-                
-                for func in functions:
-                    func_name = func.value
-                    alias = f"{column}_{func_name}"
-                    if func_name == "sum":
-                        agg_dict[column] = "sum"
-                    elif func_name == "avg":
-                        agg_dict[column] = "mean"
-                    elif func_name == "count":
-                        agg_dict[column] = "count"
-                    elif func_name == "min":
-                        agg_dict[column] = "min"
-                    elif func_name == "max":
-                        agg_dict[column] = "max"
-                    elif func_name == "std":
-                        agg_dict[column] = "std"
-                    elif func_name == "var":
-                        agg_dict[column] = "var"
-                    elif func_name == "median":
-                        agg_dict[column] = "median"
-            
-            if agg_dict:
-                result = grouped.agg(agg_dict)
-            else:
-                result = grouped.size().to_frame(name="count")
+        agg_map = self._build_agg_map(df, aggregations)
+        if agg_map:
+            result = grouped.agg(agg_map)
+            result.columns = [
+                f"{column}_{_PANDAS_TO_AGG[pd_func]}" for column, pd_func in result.columns
+            ]
         else:
             # Default: count
             result = grouped.size().to_frame(name="count")
         
+        if interval in _FIXED_INTERVALS and not valid_group_by:
+            # groupby only yields buckets that contain rows; resample returned
+            # every bucket in the range
+            result = _fill_empty_buckets(result, freq)
+        
         result = result.reset_index()
+        if interval in _FIXED_INTERVALS:
+            result = result.sort_values([time_column] + valid_group_by, ignore_index=True)
         return result
     
     def optimize_query(self, query: str) -> str:
         """Optimize SQL query for better performance."""
-        # Basic query optimization
-        query_upper = query.upper().strip()
+        # Basic query optimization: find the relevant keywords in one pass
+        keywords = {_WS_RE.sub(" ", match.group(1).upper()) for match in _KEYWORD_RE.finditer(query)}
         
         # Remove unnecessary whitespace
-        query = " ".join(query.split())
+        query = _WS_RE.sub(" ", query).strip()
         
         # Add LIMIT if SELECT without LIMIT and no aggregation
-        if "SELECT" in query_upper and "LIMIT" not in query_upper:
+        if "SELECT" in keywords and "LIMIT" not in keywords:
             # Check if it's a simple SELECT (not a subquery or complex query)
-            if "GROUP BY" not in query_upper and "UNION" not in query_upper:
+            if "GROUP BY" not in keywords and "UNION" not in keywords:
                 # Add a reasonable default limit for safety
-                if "OFFSET" in query_upper:
+                if "OFFSET" in keywords:
                     # Insert LIMIT before OFFSET
-                    query = query.replace("OFFSET", "LIMIT 1000 OFFSET")
+                    query = _OFFSET_RE.sub("LIMIT 1000 OFFSET", query, count=1)
                 else:
                     query += " LIMIT 1000"
         
@@ -625,3 +1022,8 @@ class AnalyticsEngine:
     ) -> QueryBuilder:
         """Create a new query builder instance."""
         return QueryBuilder(table_name)
+
+
+# Shared by the API and the chatbot so they reuse one result cache and see
+# each other's invalidations
+analytics_engine = AnalyticsEngine()
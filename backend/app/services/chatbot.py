@@ -1,22 +1,173 @@
-from typing import Dict, Any, Optional, List
+from typing import AsyncIterator, Callable, Dict, Any, NamedTuple, Optional, List, Tuple
 from datetime import datetime
+import asyncio
+import hashlib
+import os
+import random
+import re
 import time
 import json
 import statistics
+from sqlalchemy import inspect
+from sqlalchemy.exc import InterfaceError, OperationalError, TimeoutError as PoolTimeoutError
 from sqlalchemy.orm import Session
 from langchain_openai import ChatOpenAI
 from langchain_community.llms import Ollama
 from langchain.prompts import ChatPromptTemplate, SystemMessagePromptTemplate, HumanMessagePromptTemplate
-from langchain.chains import LLMChain
-from langchain.schema import BaseMessage, HumanMessage, AIMessage
+from langchain.schema.output_parser import StrOutputParser
+from langchain.schema import BaseMessage, HumanMessage, AIMessage, SystemMessage
+import httpx
+import openai
 import pandas as pd
 import numpy as np
 
+from app.core.cache import cache_service
+from app.core.memory_cache import MemoryCache
 from app.core.config import settings
+from app.core.database import SessionLocal
 from app.models.chatbot import Conversation, ChatMessage, QueryHistory
 from app.models.datasource import DataSource, DataSourceType
 from app.models.user import User
-from app.services.analytics import AnalyticsEngine
+from app.services.analytics import analytics_engine
+
+try:
+    # Optional: C JSON codec for prompt previews and parsing LLM output
+    import orjson
+except ImportError:
+    orjson = None
+
+
+# Keep provider connections warm between chat turns; the OpenAI SDK default
+# drops idle connections after 5s, forcing a new TLS handshake
+_LLM_HTTP_LIMITS = httpx.Limits(max_connections=100, max_keepalive_connections=50, keepalive_expiry=60)
+
+_SQL_DIALECTS = {
+    DataSourceType.POSTGRESQL: "PostgreSQL",
+    DataSourceType.MYSQL: "MySQL",
+}
+
+_STORED_RESULT_ROWS = 200  # Result rows kept in a saved message's metadata
+_ROLE_MESSAGES = {"user": HumanMessage, "assistant": AIMessage}  # Stored role -> LangChain message
+
+_RETRIABLE_DB_ERRORS = (OperationalError, InterfaceError, PoolTimeoutError)
+_RETRY_BASE_DELAY = 0.1  # Seconds; doubles per attempt
+_RETRY_MAX_DELAY = 2.0
+
+_VIZ_CACHE_MAXSIZE = 1024
+_FILE_CACHE_MAXSIZE = 256  # File prompt prefixes, and file query replies
+
+_SCHEMA_CACHE_TTL = 300  # seconds
+_SCHEMA_CACHE_MAXSIZE = 256
+_SCHEMA_MAX_TABLES = 50  # Tables described in the SQL prompt when none is configured
+
+_WORD_RE = re.compile(r"\w+")
+_FEW_SHOT_EXAMPLES = 3
+_FEW_SHOT_CANDIDATES = 200  # Recent successful queries scanned for examples
+_DANGEROUS_SQL_RE = re.compile(r"\b(DROP|DELETE|TRUNCATE|ALTER|CREATE|INSERT|UPDATE|GRANT|REVOKE)\b", re.IGNORECASE)
+_SELECT_SQL_RE = re.compile(r"\s*(WITH|SELECT)\b", re.IGNORECASE)
+_FENCE_RE = re.compile(r"```[A-Za-z]*\s*(.*?)\s*```", re.DOTALL)
+_TIME_RE = re.compile(r"date|time|year|month|day", re.IGNORECASE)
+_TYPE_SNIFF_ROWS = 500  # Rows inspected when guessing column types
+_NUMERIC_SHARE = 0.9  # Share of non-null values that must parse as numbers
+_NUMERIC_PROBE_ROWS = 100  # Values tried before a text column is ruled non-numeric
+
+
+_PREVIEW_ROWS = 10
+_PREVIEW_COLUMNS = 6
+_PREVIEW_CELL_WIDTH = 80
+
+
+def _unfence(text: str) -> str:
+    """Body of the first markdown code block in text, or the whole text."""
+    fenced = _FENCE_RE.search(text)
+    return (fenced.group(1) if fenced else text).strip()
+
+
+def _json_dumps(value: Any, indent: bool = False) -> str:
+    """Serialize to JSON text, stringifying values JSON has no type for."""
+    if orjson is not None:
+        option = orjson.OPT_SERIALIZE_NUMPY | (orjson.OPT_INDENT_2 if indent else 0)
+        return orjson.dumps(value, default=str, option=option).decode()
+    return json.dumps(value, indent=2 if indent else None, default=str)
+
+
+def _json_loads(text: str) -> Any:
+    return orjson.loads(text) if orjson is not None else json.loads(text)
+
+
+def _rows_to_markdown(rows: List[Dict[str, Any]], columns: List[str]) -> str:
+    """Compact markdown table of result rows for prompts.
+    
+    Columns that are empty in every row are left out and wide cells are cut.
+    """
+    columns = [col for col in columns if any(row.get(col) is not None for row in rows)]
+    columns = columns[:_PREVIEW_COLUMNS]
+    if not columns:
+        return "(no values)"
+    
+    def cell(value: Any) -> str:
+        if value is None:
+            return ""
+        return str(value)[:_PREVIEW_CELL_WIDTH].replace("|", "\\|").replace("\n", " ")
+    
+    lines = [
+        "| " + " | ".join(columns) + " |",
+        "|" + "---|" * len(columns)
+    ]
+    for row in rows:
+        lines.append("| " + " | ".join(cell(row.get(col)) for col in columns) + " |")
+    return "\n".join(lines)
+
+
+def _stored_result(query_result: Optional[Dict[str, Any]]) -> Optional[Dict[str, Any]]:
+    """Query result as saved with a message: the leading rows, enough to redraw its chart."""
+    if not query_result or len(query_result.get("data") or []) <= _STORED_RESULT_ROWS:
+        return query_result
+    return {**query_result, "data": query_result["data"][:_STORED_RESULT_ROWS], "truncated": True}
+
+
+def _to_numeric_column(values: pd.Series) -> pd.Series:
+    """Column as numbers, NaN where a value does not parse.
+    
+    Parsing every string of a text column is the slow part, so string
+    columns whose leading values hold no number are skipped wholesale.
+    """
+    if pd.api.types.is_numeric_dtype(values):
+        return values
+    if pd.api.types.infer_dtype(values, skipna=True) == "string":
+        probe = pd.to_numeric(values.dropna().head(_NUMERIC_PROBE_ROWS), errors="coerce")
+        if probe.isna().all():
+            return pd.Series(np.nan, index=values.index)
+    return pd.to_numeric(values, errors="coerce")
+
+
+def _numeric_columns(data: List[Dict[str, Any]], columns: List[str]) -> List[str]:
+    """Columns whose non-null values in the leading rows are (almost all) numbers."""
+    sample = pd.DataFrame(data[:_TYPE_SNIFF_ROWS], columns=columns)
+    # Decimals and numeric strings arrive as object columns; tolerate a few stray labels
+    present = sample.notna().sum()
+    parsed = sample.apply(_to_numeric_column).notna().sum()
+    numeric = (present > 0) & (parsed > _NUMERIC_SHARE * present)
+    return [col for col, is_numeric in zip(columns, numeric) if is_numeric]
+
+
+class ProcessInput(NamedTuple):
+    """One message for ChatbotService.aprocess_messages."""
+    user: User
+    message: str
+    conversation_id: Optional[int] = None
+    datasource_id: Optional[int] = None
+    password: Optional[str] = None
+
+
+class _PreparedMessage(NamedTuple):
+    """State shared by the reply steps of a message."""
+    conversation: Conversation
+    datasource: Optional[DataSource]
+    sql_query: Optional[str]
+    query_result: Optional[Dict[str, Any]]
+    stats: Optional[List[Dict[str, Any]]]
+    pending: List[Any]  # Rows written together with the reply
 
 
 class ChatbotService:
@@ -24,10 +175,29 @@ class ChatbotService:
     
     def __init__(self):
         """Initialize the chatbot service."""
+        # Shared by every OpenAI request this service makes
+        self._http_client = openai.DefaultHttpxClient(limits=_LLM_HTTP_LIMITS)
+        self._http_async_client = openai.DefaultAsyncHttpxClient(limits=_LLM_HTTP_LIMITS)
         self.llm = self._initialize_llm()
-        self.analytics_engine = AnalyticsEngine()
+        self.analytics_engine = analytics_engine
         self._sql_prompt_template = self._create_sql_prompt_template()
         self._response_prompt_template = self._create_response_prompt_template()
+        self._sql_chain = self._sql_prompt_template | self._prefix_cached_llm(self._sql_prompt_template) | StrOutputParser()
+        self._response_chain = self._response_prompt_template | self._prefix_cached_llm(self._response_prompt_template) | StrOutputParser()
+        self._analysis_prompt_template = self._create_analysis_prompt_template()
+        self._analysis_chain = self._analysis_prompt_template | self._prefix_cached_llm(
+            self._analysis_prompt_template, response_format={"type": "json_object"}
+        ) | StrOutputParser()
+        # Generated SQL by prompt digest
+        self._sql_cache = MemoryCache(maxsize=settings.CHATBOT_SQL_CACHE_SIZE)
+        # (datasource id, updated_at, table) -> column names by table
+        self._schema_cache = MemoryCache(maxsize=_SCHEMA_CACHE_MAXSIZE, ttl=_SCHEMA_CACHE_TTL)
+        # (normalized question, columns) -> parsed LLM chart suggestion
+        self._viz_cache = MemoryCache(maxsize=_VIZ_CACHE_MAXSIZE)
+        # (datasource id, file path, mtime) -> file query system prompt
+        self._file_prompt_cache = MemoryCache(maxsize=_FILE_CACHE_MAXSIZE)
+        # (file key, normalized question) -> reply
+        self._file_reply_cache = MemoryCache(maxsize=_FILE_CACHE_MAXSIZE)
     
     def _initialize_llm(self):
         """Initialize LLM based on configuration."""
@@ -39,7 +209,9 @@ class ChatbotService:
             return ChatOpenAI(
                 model=settings.LLM_MODEL,
                 temperature=settings.CHATBOT_TEMPERATURE,
-                api_key=settings.OPENAI_API_KEY
+                api_key=settings.OPENAI_API_KEY,
+                http_client=self._http_client,
+                http_async_client=self._http_async_client
             )
         elif provider == "ollama":
             base_url = settings.LLM_BASE_URL or "http://localhost:11434"
@@ -52,18 +224,35 @@ class ChatbotService:
             # Default to OpenAI
             return ChatOpenAI(
                 model=settings.LLM_MODEL or "gpt-3.5-turbo",
-                temperature=settings.CHATBOT_TEMPERATURE
+                temperature=settings.CHATBOT_TEMPERATURE,
+                http_client=self._http_client,
+                http_async_client=self._http_async_client
             )
     
+    def _prefix_cached_llm(self, prompt_template: ChatPromptTemplate, **openai_kwargs):
+        """LLM for a chain whose system message is a static prefix.
+        
+        OpenAI caches repeated prompt prefixes automatically; a prompt_cache_key
+        derived from the system text routes calls sharing it to the same cache.
+        openai_kwargs are extra request options bound only for OpenAI.
+        """
+        if not isinstance(self.llm, ChatOpenAI):
+            return self.llm
+        system_text = prompt_template.messages[0].prompt.template
+        cache_key = hashlib.blake2b(system_text.encode(), digest_size=8).hexdigest()
+        return self.llm.bind(extra_body={"prompt_cache_key": f"intellibi-{cache_key}"}, **openai_kwargs)
+    
+    async def aclose(self):
+        """Close the pooled HTTP connections to the LLM provider."""
+        self._http_client.close()
+        await self._http_async_client.aclose()
+    
     def _create_sql_prompt_template(self) -> ChatPromptTemplate:
         """Create prompt template for SQL query generation."""
+        # The system message is static so providers can cache it as a prompt
+        # prefix; everything per-request lives in the human message
         system_template = """You are a SQL query expert. Your task is to convert natural language questions into SQL queries.
 
-Available database information:
-{schema_info}
-
-SQL Dialect: {sql_dialect}
-
 Rules:
 1. Only generate valid SQL SELECT queries
 2. Use proper table and column names from the schema
@@ -78,11 +267,19 @@ Examples:
 - "Top 10 products by sales" -> SELECT * FROM products ORDER BY sales DESC LIMIT 10
 """
 
-        human_template = """Question: {question}
+        human_template = """Available database information:
+{schema_info}
+
+SQL Dialect: {sql_dialect}
+
+Question: {question}
 
 Conversation history:
 {conversation_history}
 
+Similar questions answered before on this datasource:
+{retrieved_examples}
+
 Generate the SQL query:"""
 
         return ChatPromptTemplate.from_messages([
@@ -114,6 +311,34 @@ Generate a helpful response explaining these results:"""
             HumanMessagePromptTemplate.from_template(human_template)
         ])
     
+    def _create_analysis_prompt_template(self) -> ChatPromptTemplate:
+        """Create prompt template for the combined reply, insights, follow-ups and chart."""
+        system_template = """You are a helpful data analyst assistant. Given a question and its query results, you write the reply shown to the user and the analysis shown beside it.
+
+Return only a JSON object with these keys:
+- "response": a clear, concise natural language explanation of the results that highlights key numbers or trends
+- "insights": an object with "summary" (string), "trends", "anomalies" and "correlations" (lists of strings, empty if none)
+- "suggested_queries": 3-5 useful follow-up questions (strings)
+- "visualization": an object with "chart_type" (one of line_chart, bar_chart, pie_chart, area_chart, scatter_chart, heatmap, table) and "reasoning"
+"""
+
+        human_template = """Query: {query}
+
+Query Results:
+{query_results}"""
+
+        return ChatPromptTemplate.from_messages([
+            SystemMessagePromptTemplate.from_template(system_template),
+            HumanMessagePromptTemplate.from_template(human_template)
+        ])
+    
+    async def _ainvoke_text(self, prompt: str) -> str:
+        """Send a plain prompt to the LLM and return the response text."""
+        response = await self.llm.ainvoke(prompt)
+        if hasattr(response, 'content'):
+            return response.content
+        return str(response)
+    
     def _get_schema_info(self, datasource: DataSource, db: Session) -> str:
         """Get schema information for a datasource."""
         schema_info = []
@@ -129,39 +354,56 @@ Generate a helpful response explaining these results:"""
         elif datasource.type in [DataSourceType.POSTGRESQL, DataSourceType.MYSQL]:
             # For database datasources, try to get table schema
             try:
-                from app.services.database_connector import DatabaseConnector
-                connector = DatabaseConnector()
-                engine = connector.create_engine(datasource)
-                
                 # Get table name from connection_config or use a default
                 table_name = None
                 if datasource.connection_config:
                     table_name = datasource.connection_config.get("table_name")
                 
-                if table_name:
-                    from sqlalchemy import inspect
-                    inspector = inspect(engine)
-                    columns = inspector.get_columns(table_name)
-                    column_names = [col["name"] for col in columns]
-                    schema_info.append(f"Table: {table_name}")
-                    schema_info.append(f"Columns: {', '.join(column_names)}")
+                tables = self._get_table_columns(datasource, table_name)
+                for name in sorted(tables)[:_SCHEMA_MAX_TABLES]:
+                    schema_info.append(f"Table: {name}")
+                    schema_info.append(f"Columns: {', '.join(tables[name])}")
             except Exception as e:
                 schema_info.append(f"Database: {datasource.database_name}")
                 schema_info.append(f"Note: Could not retrieve schema details - {str(e)}")
         
         return "\n".join(schema_info) if schema_info else "No schema information available"
     
+    def _get_table_columns(self, datasource: DataSource, table_name: Optional[str]) -> Dict[str, List[str]]:
+        """Column names by table, introspected at most once per TTL.
+        
+        With no table name every table of the default schema is read in one
+        get_multi_columns pass. Keyed on updated_at so editing the datasource
+        invalidates the entry.
+        """
+        key = (datasource.id, datasource.updated_at, table_name)
+        tables = self._schema_cache.get(key)
+        if tables is not None:
+            return tables
+        
+        # Reuse the analytics engine's connector so its pooled engine is shared
+        engine = self.analytics_engine.db_connector.create_engine(datasource)
+        inspector = inspect(engine)
+        if table_name:
+            tables = {table_name: [col["name"] for col in inspector.get_columns(table_name)]}
+        else:
+            tables = {
+                table: [col["name"] for col in columns]
+                for (_, table), columns in inspector.get_multi_columns().items()
+            }
+        
+        self._schema_cache.set(key, tables)
+        return tables
+    
+    def invalidate_schema(self, datasource_id: int) -> None:
+        """Drop cached table columns for a datasource so the next turn re-reads them."""
+        self._schema_cache.invalidate(lambda key: key[0] == datasource_id)
+    
     def _get_sql_dialect(self, datasource: Optional[DataSource]) -> str:
         """Get SQL dialect for datasource."""
         if not datasource:
             return "PostgreSQL"
-        
-        if datasource.type == DataSourceType.POSTGRESQL:
-            return "PostgreSQL"
-        elif datasource.type == DataSourceType.MYSQL:
-            return "MySQL"
-        else:
-            return "PostgreSQL"  # Default
+        return _SQL_DIALECTS.get(datasource.type, "PostgreSQL")  # PostgreSQL by default
     
     def get_conversation_context(
         self,
@@ -172,25 +414,25 @@ Generate a helpful response explaining these results:"""
         """Retrieve conversation context (message history)."""
         limit = limit or settings.CHATBOT_MAX_CONTEXT_MESSAGES
         
-        messages = db.query(ChatMessage)\
+        # Newest N via the (conversation_id, created_at) index, handed back oldest first
+        newest = db.query(ChatMessage.role, ChatMessage.content, ChatMessage.created_at)\
             .filter(ChatMessage.conversation_id == conversation_id)\
             .order_by(ChatMessage.created_at.desc())\
             .limit(limit)\
+            .subquery()
+        rows = db.query(newest.c.role, newest.c.content)\
+            .order_by(newest.c.created_at.asc())\
             .all()
         
-        # Reverse to get chronological order
-        messages = list(reversed(messages))
-        
-        context = []
-        for msg in messages:
-            if msg.role == "user":
-                context.append(HumanMessage(content=msg.content))
-            elif msg.role == "assistant":
-                context.append(AIMessage(content=msg.content))
+        context = [
+            _ROLE_MESSAGES[role](content=content)
+            for role, content in rows
+            if role in _ROLE_MESSAGES
+        ]
         
         return context
     
-    def convert_query_to_sql(
+    async def aconvert_query_to_sql(
         self,
         question: str,
         datasource: Optional[DataSource],
@@ -198,7 +440,11 @@ Generate a helpful response explaining these results:"""
         db: Session
     ) -> str:
         """Convert natural language query to SQL."""
-        schema_info = self._get_schema_info(datasource, db) if datasource else "No datasource specified"
+        # Schema introspection talks to the datasource; keep it off the event loop
+        schema_info = (
+            await asyncio.to_thread(self._get_schema_info, datasource, db)
+            if datasource else "No datasource specified"
+        )
         sql_dialect = self._get_sql_dialect(datasource)
         
         # Format conversation history
@@ -212,28 +458,93 @@ Generate a helpful response explaining these results:"""
                     history_parts.append(f"Assistant: {msg.content}")
             history_text = "\n".join(history_parts)
         
-        # Create chain and generate SQL
-        chain = LLMChain(llm=self.llm, prompt=self._sql_prompt_template)
+        history_text = history_text or "No previous conversation"
         
-        result = chain.run(
-            question=question,
-            schema_info=schema_info,
-            sql_dialect=sql_dialect,
-            conversation_history=history_text or "No previous conversation"
-        )
+        examples = self._similar_past_queries(question, datasource, db) if datasource and db else []
+        examples_text = "\n".join(f"- \"{text}\" -> {sql}" for text, sql in examples) or "None"
+        
+        # Identical question + schema + dialect + history + examples yields the same SQL
+        cache_key = self._sql_cache_key(question, schema_info, sql_dialect, history_text, examples_text)
+        cached_sql = self._get_cached_sql(cache_key)
+        if cached_sql is not None:
+            return cached_sql
+        
+        # Generate SQL
+        result = await self._sql_chain.ainvoke({
+            "question": question,
+            "schema_info": schema_info,
+            "sql_dialect": sql_dialect,
+            "conversation_history": history_text,
+            "retrieved_examples": examples_text
+        })
+        
+        # Clean up SQL query (take the body of a markdown code block if present)
+        sql_query = _unfence(result)
+        
+        self._cache_sql(cache_key, sql_query)
+        return sql_query
+    
+    def _sql_cache_key(self, question: str, *context: str) -> str:
+        """Digest of everything that shapes the generated SQL."""
+        normalized_question = " ".join(question.split())
+        digest = hashlib.blake2b(digest_size=16)
+        for part in (normalized_question, *context):
+            digest.update(part.encode())
+            digest.update(b"\0")
+        return f"chatbot:sql:{digest.hexdigest()}"
+    
+    def _similar_past_queries(
+        self,
+        question: str,
+        datasource: DataSource,
+        db: Session,
+        k: int = _FEW_SHOT_EXAMPLES
+    ) -> List[Tuple[str, str]]:
+        """Recent successful (question, SQL) pairs on the datasource most like the question.
+        
+        Ranked by word overlap (Jaccard); pairs sharing no words are dropped.
+        """
+        words = set(_WORD_RE.findall(question.lower()))
+        if not words:
+            return []
         
-        # Clean up SQL query (remove markdown code blocks if present)
-        sql_query = result.strip()
-        if sql_query.startswith("```sql"):
-            sql_query = sql_query[6:]
-        if sql_query.startswith("```"):
-            sql_query = sql_query[3:]
-        if sql_query.endswith("```"):
-            sql_query = sql_query[:-3]
-        sql_query = sql_query.strip()
+        rows = db.query(QueryHistory.query_text, QueryHistory.sql_query)\
+            .filter(
+                QueryHistory.datasource_id == datasource.id,
+                QueryHistory.success == "true",
+                QueryHistory.sql_query.isnot(None)
+            )\
+            .order_by(QueryHistory.created_at.desc())\
+            .limit(_FEW_SHOT_CANDIDATES)\
+            .all()
+        
+        scored = {}
+        for text, sql in rows:
+            candidate = set(_WORD_RE.findall(text.lower()))
+            score = len(words & candidate) / len(words | candidate) if candidate else 0.0
+            # Keep the best-matching question for each distinct SQL
+            if score > 0 and score > scored.get(sql, (0.0, ""))[0]:
+                scored[sql] = (score, text)
+        
+        best = sorted(scored.items(), key=lambda item: item[1][0], reverse=True)[:k]
+        return [(text, sql) for sql, (score, text) in best]
+    
+    def _get_cached_sql(self, cache_key: str) -> Optional[str]:
+        """Look up generated SQL in the process cache, then Redis."""
+        sql_query = self._sql_cache.get(cache_key)
+        if sql_query is not None:
+            return sql_query
         
+        sql_query = cache_service.get(cache_key)
+        if sql_query is not None:
+            self._sql_cache.set(cache_key, sql_query)
         return sql_query
     
+    def _cache_sql(self, cache_key: str, sql_query: str):
+        """Store generated SQL in the process cache and Redis."""
+        self._sql_cache.set(cache_key, sql_query)
+        cache_service.set(cache_key, sql_query, ttl=settings.CHATBOT_SQL_CACHE_TTL)
+    
     def execute_query(
         self,
         sql_query: str,
@@ -243,22 +554,19 @@ Generate a helpful response explaining these results:"""
     ) -> Dict[str, Any]:
         """Execute SQL query via analytics engine with retry logic."""
         # Validate SQL query before execution
-        sql_upper = sql_query.upper().strip()
-        dangerous_keywords = ["DROP", "DELETE", "TRUNCATE", "ALTER", "CREATE", "INSERT", "UPDATE"]
-        
-        for keyword in dangerous_keywords:
-            if keyword in sql_upper:
-                return {
-                    "success": False,
-                    "error": f"Query contains dangerous keyword '{keyword}'. Only SELECT queries are allowed.",
-                    "data": [],
-                    "columns": [],
-                    "row_count": 0,
-                    "execution_time": 0
-                }
+        dangerous = _DANGEROUS_SQL_RE.search(sql_query)
+        if dangerous:
+            return {
+                "success": False,
+                "error": f"Query contains dangerous keyword '{dangerous.group(1).upper()}'. Only SELECT queries are allowed.",
+                "data": [],
+                "columns": [],
+                "row_count": 0,
+                "execution_time": 0
+            }
         
-        # Ensure it's a SELECT query
-        if not sql_upper.startswith("SELECT"):
+        # Ensure it's a SELECT query (optionally behind a CTE)
+        if not _SELECT_SQL_RE.match(sql_query):
             return {
                 "success": False,
                 "error": "Only SELECT queries are allowed.",
@@ -268,45 +576,46 @@ Generate a helpful response explaining these results:"""
                 "execution_time": 0
             }
         
-        # Retry logic
+        # Retry only transient failures, backing off with jitter so concurrent retries spread out
         last_error = None
         for attempt in range(max_retries + 1):
+            if attempt:
+                time.sleep(random.uniform(0, min(_RETRY_MAX_DELAY, _RETRY_BASE_DELAY * 2 ** attempt)))
             try:
                 start_time = time.time()
                 result = self.analytics_engine.execute_query(
                     datasource=datasource,
                     query=sql_query,
-                    password=password
+                    password=password,
+                    max_rows=settings.CHATBOT_MAX_RESULT_ROWS
                 )
                 execution_time = time.time() - start_time
-                
-                return {
-                    "success": True,
-                    "data": result.get("data", []),
-                    "columns": result.get("columns", []),
-                    "row_count": len(result.get("data", [])),
-                    "execution_time": execution_time
-                }
             except Exception as e:
                 last_error = str(e)
-                if attempt < max_retries:
-                    time.sleep(0.5)  # Brief delay before retry
+                if isinstance(e, _RETRIABLE_DB_ERRORS):
                     continue
-                else:
-                    # Provide helpful error message
-                    error_msg = self._format_error_message(last_error, sql_query)
-                    return {
-                        "success": False,
-                        "error": error_msg,
-                        "data": [],
-                        "columns": [],
-                        "row_count": 0,
-                        "execution_time": 0
-                    }
+                break
+            
+            # The connector reports SQL errors in the result instead of raising
+            if result.get("success") is False:
+                last_error = result.get("error")
+                if result.get("retriable"):
+                    continue
+                break
+            
+            return {
+                "success": True,
+                "data": result.get("data", []),
+                "columns": result.get("columns", []),
+                "row_count": len(result.get("data", [])),
+                "truncated": result.get("truncated", False),
+                "execution_time": execution_time
+            }
         
+        # Provide helpful error message
         return {
             "success": False,
-            "error": str(last_error) if last_error else "Unknown error",
+            "error": self._format_error_message(last_error or "Unknown error", sql_query),
             "data": [],
             "columns": [],
             "row_count": 0,
@@ -328,24 +637,35 @@ Generate a helpful response explaining these results:"""
         else:
             return f"Query execution error: {error}. Please try rephrasing your question or check the datasource configuration."
     
-    def generate_response(
-        self,
-        query: str,
-        query_results: Dict[str, Any],
-        stats: Optional[List[Dict[str, Any]]] = None
-    ) -> str:
-        """Generate natural language response from query results with enhanced interpretation."""
+    def _canned_response(self, query_results: Dict[str, Any]) -> Optional[str]:
+        """Fixed reply for failed, empty or single-row results, which need no LLM call."""
         if not query_results.get("success"):
             error_msg = query_results.get("error", "Unknown error")
             return f"I encountered an error while executing your query: {error_msg}. Please try rephrasing your question or check if the datasource is properly configured."
         
-        # Format results for prompt
+        if query_results.get("row_count", 0) == 0:
+            return "The query executed successfully but returned no results. You might want to adjust your filters or check if the data exists."
+        
+        # A single row (e.g. a COUNT or SUM) reads fine as is
         data = query_results.get("data", [])
-        row_count = query_results.get("row_count", 0)
         columns = query_results.get("columns", [])
+        if len(data) == 1 and columns:
+            row = data[0]
+            if len(columns) == 1:
+                return f"The result is {row.get(columns[0])}."
+            return "The query returned one row: " + ", ".join(f"{col} = {row.get(col)}" for col in columns) + "."
         
-        if row_count == 0:
-            return "The query executed successfully but returned no results. You might want to adjust your filters or check if the data exists."
+        return None
+    
+    def _format_query_results(
+        self,
+        query_results: Dict[str, Any],
+        stats: Optional[List[Dict[str, Any]]] = None
+    ) -> str:
+        """Describe query results for the response prompt."""
+        data = query_results.get("data", [])
+        row_count = query_results.get("row_count", 0)
+        columns = query_results.get("columns", [])
         
         # Include statistical summary if available
         stats_text = ""
@@ -355,23 +675,52 @@ Generate a helpful response explaining these results:"""
                 stats_text += f"- {stat['column']}: mean={stat.get('mean', 'N/A'):.2f}, min={stat.get('min', 'N/A')}, max={stat.get('max', 'N/A')}\n"
         
         # Limit data shown in prompt (first 10 rows)
-        preview_data = json.dumps(data[:10], indent=2, default=str)
+        preview_data = _rows_to_markdown(data[:_PREVIEW_ROWS], columns)
         
-        results_text = f"Found {row_count} rows with {len(columns)} columns.\n\nColumns: {', '.join(columns)}{stats_text}\n\nFirst few rows:\n{preview_data}"
-        if row_count > 10:
-            results_text += f"\n... and {row_count - 10} more rows"
-        
-        # Create chain and generate response
-        chain = LLMChain(llm=self.llm, prompt=self._response_prompt_template)
+        found = f"at least {row_count}" if query_results.get("truncated") else str(row_count)
+        results_text = f"Found {found} rows with {len(columns)} columns.\n\nColumns: {', '.join(columns)}{stats_text}\n\nFirst few rows:\n{preview_data}"
+        if row_count > _PREVIEW_ROWS:
+            results_text += f"\n... and {row_count - _PREVIEW_ROWS} more rows"
+        return results_text
+    
+    async def agenerate_response(
+        self,
+        query: str,
+        query_results: Dict[str, Any],
+        stats: Optional[List[Dict[str, Any]]] = None
+    ) -> str:
+        """Generate natural language response from query results with enhanced interpretation."""
+        canned = self._canned_response(query_results)
+        if canned is not None:
+            return canned
         
-        response = chain.run(
-            query=query,
-            query_results=results_text
-        )
+        # Generate response
+        response = await self._response_chain.ainvoke({
+            "query": query,
+            "query_results": self._format_query_results(query_results, stats)
+        })
         
         return response.strip()
     
-    def _generate_suggested_queries(self, query: str, query_results: Dict[str, Any], columns: List[str]) -> List[str]:
+    async def agenerate_response_stream(
+        self,
+        query: str,
+        query_results: Dict[str, Any],
+        stats: Optional[List[Dict[str, Any]]] = None
+    ) -> AsyncIterator[str]:
+        """Like agenerate_response, but yield the text as the LLM produces it."""
+        canned = self._canned_response(query_results)
+        if canned is not None:
+            yield canned
+            return
+        
+        async for chunk in self._response_chain.astream({
+            "query": query,
+            "query_results": self._format_query_results(query_results, stats)
+        }):
+            yield chunk
+    
+    async def _agenerate_suggested_queries(self, query: str, query_results: Dict[str, Any], columns: List[str]) -> List[str]:
         """Generate suggested follow-up queries."""
         if not query_results.get("success") or not columns:
             return []
@@ -387,20 +736,11 @@ Available columns: {', '.join(columns)}
 
 Suggest follow-up questions that would provide additional insights. Return as a JSON array of strings."""
 
-            response = self.llm.invoke(suggestion_prompt)
-            if hasattr(response, 'content'):
-                suggestion_text = response.content
-            else:
-                suggestion_text = str(response)
+            suggestion_text = await self._ainvoke_text(suggestion_prompt)
             
             # Parse JSON array
             if "[" in suggestion_text:
-                if "```json" in suggestion_text:
-                    suggestion_text = suggestion_text.split("```json")[1].split("```")[0].strip()
-                elif "```" in suggestion_text:
-                    suggestion_text = suggestion_text.split("```")[1].split("```")[0].strip()
-                
-                suggestions = json.loads(suggestion_text)
+                suggestions = _json_loads(_unfence(suggestion_text))
                 if isinstance(suggestions, list):
                     return suggestions[:5]  # Limit to 5 suggestions
         except Exception:
@@ -421,28 +761,17 @@ Suggest follow-up questions that would provide additional insights. Return as a
         if not data:
             return []
         
-        df = pd.DataFrame(data)
-        stats = []
+        # Coerce every column; non-numeric values become NaN and drop out of the reductions
+        df = pd.DataFrame(data, columns=columns)
+        numeric = df.apply(_to_numeric_column).astype("float64")
+        numeric = numeric.loc[:, numeric.notna().any()]
+        summary = numeric.agg(["mean", "median", "min", "max", "std", "count"]).T
+        summary["std"] = summary["std"].fillna(0.0)  # Undefined for a single value
+        summary = summary.astype({"count": int}).rename(columns={"std": "std_dev"})
         
-        for col in columns:
-            try:
-                numeric_data = pd.to_numeric(df[col], errors='coerce').dropna()
-                if len(numeric_data) > 0:
-                    stats.append({
-                        "column": col,
-                        "mean": float(numeric_data.mean()),
-                        "median": float(numeric_data.median()),
-                        "min": float(numeric_data.min()),
-                        "max": float(numeric_data.max()),
-                        "std_dev": float(numeric_data.std()) if len(numeric_data) > 1 else 0.0,
-                        "count": int(len(numeric_data))
-                    })
-            except Exception:
-                continue
-        
-        return stats
-    
-    def _generate_insights(self, query: str, query_results: Dict[str, Any], stats: List[Dict[str, Any]]) -> Dict[str, Any]:
+        return summary.rename_axis("column").reset_index().to_dict("records")
+    
+    async def _agenerate_insights(self, query: str, query_results: Dict[str, Any], stats: List[Dict[str, Any]]) -> Dict[str, Any]:
         """Generate insights from query results using LLM."""
         if not query_results.get("success") or not stats:
             return {}
@@ -454,7 +783,7 @@ Suggest follow-up questions that would provide additional insights. Return as a
 
 Query: {query}
 Rows returned: {row_count}
-Statistical Summary: {json.dumps(stats, indent=2)}
+Statistical Summary: {_json_dumps(stats, indent=True)}
 
 Provide insights in JSON format with:
 - summary: Brief summary of key findings
@@ -465,19 +794,10 @@ Provide insights in JSON format with:
 Return only valid JSON."""
 
         try:
-            response = self.llm.invoke(insights_prompt)
-            if hasattr(response, 'content'):
-                insights_text = response.content
-            else:
-                insights_text = str(response)
+            insights_text = await self._ainvoke_text(insights_prompt)
             
             # Try to parse JSON from response
-            if "```json" in insights_text:
-                insights_text = insights_text.split("```json")[1].split("```")[0].strip()
-            elif "```" in insights_text:
-                insights_text = insights_text.split("```")[1].split("```")[0].strip()
-            
-            insights = json.loads(insights_text)
+            insights = _json_loads(_unfence(insights_text))
             return insights
         except Exception as e:
             # Fallback to simple insights
@@ -488,7 +808,45 @@ Return only valid JSON."""
                 "correlations": []
             }
     
-    def suggest_visualization(
+    async def _allm_visualization(self, query: str, columns: List[str], data: List[Dict[str, Any]]) -> Dict[str, Any]:
+        """Ask the LLM for a chart type; raises if the reply is not a JSON object."""
+        viz_prompt = f"""Based on this query and data structure, suggest the best visualization:
+
+Query: {query}
+Columns: {', '.join(columns)}
+Number of rows: {len(data)}
+Sample data:
+{_rows_to_markdown(data[:3], columns)}
+
+Suggest the best chart type (line_chart, bar_chart, pie_chart, area_chart, scatter_chart, heatmap, table) and provide reasoning.
+Return JSON with: {{"chart_type": "...", "reasoning": "..."}}"""
+
+        viz_text = await self._ainvoke_text(viz_prompt)
+        
+        # Parse JSON from response
+        suggestion = _json_loads(_unfence(viz_text))
+        if not isinstance(suggestion, dict):
+            raise ValueError("Visualization suggestion is not a JSON object")
+        return suggestion
+    
+    def _visualization_config(self, suggestion: Dict[str, Any], columns: List[str]) -> Dict[str, Any]:
+        """Attach axis configuration to an LLM chart suggestion."""
+        # Add configuration suggestions
+        config = {}
+        if suggestion.get("chart_type") == "line_chart":
+            config = {"x_axis": columns[0] if columns else None, "y_axis": columns[1] if len(columns) > 1 else None}
+        elif suggestion.get("chart_type") == "bar_chart":
+            config = {"x_axis": columns[0] if columns else None, "y_axis": columns[1] if len(columns) > 1 else None}
+        elif suggestion.get("chart_type") == "pie_chart":
+            config = {"label": columns[0] if columns else None, "value": columns[1] if len(columns) > 1 else None}
+        
+        return {
+            "chart_type": suggestion.get("chart_type", "bar_chart"),
+            "config": config,
+            "reasoning": suggestion.get("reasoning", "LLM suggested visualization")
+        }
+    
+    async def asuggest_visualization(
         self,
         query: str,
         query_results: Dict[str, Any]
@@ -503,62 +861,24 @@ Return only valid JSON."""
         if not data or not columns:
             return None
         
+        # Same question wording (ignoring case and punctuation) over the same columns
+        cache_key = (" ".join(_WORD_RE.findall(query.lower())), tuple(columns))
+        llm_suggestion = self._viz_cache.get(cache_key)
+        
         # First try LLM-based suggestion
         try:
-            viz_prompt = f"""Based on this query and data structure, suggest the best visualization:
-
-Query: {query}
-Columns: {', '.join(columns)}
-Number of rows: {len(data)}
-Sample data: {json.dumps(data[:3], default=str)}
-
-Suggest the best chart type (line_chart, bar_chart, pie_chart, area_chart, scatter_chart, heatmap, table) and provide reasoning.
-Return JSON with: {{"chart_type": "...", "reasoning": "..."}}"""
-
-            response = self.llm.invoke(viz_prompt)
-            if hasattr(response, 'content'):
-                viz_text = response.content
-            else:
-                viz_text = str(response)
-            
-            # Parse JSON from response
-            if "```json" in viz_text:
-                viz_text = viz_text.split("```json")[1].split("```")[0].strip()
-            elif "```" in viz_text:
-                viz_text = viz_text.split("```")[1].split("```")[0].strip()
-            
-            llm_suggestion = json.loads(viz_text)
+            if llm_suggestion is None:
+                llm_suggestion = await self._allm_visualization(query, columns, data)
+                self._viz_cache.set(cache_key, llm_suggestion)
             
-            # Add configuration suggestions
-            config = {}
-            if llm_suggestion.get("chart_type") == "line_chart":
-                config = {"x_axis": columns[0] if columns else None, "y_axis": columns[1] if len(columns) > 1 else None}
-            elif llm_suggestion.get("chart_type") == "bar_chart":
-                config = {"x_axis": columns[0] if columns else None, "y_axis": columns[1] if len(columns) > 1 else None}
-            elif llm_suggestion.get("chart_type") == "pie_chart":
-                config = {"label": columns[0] if columns else None, "value": columns[1] if len(columns) > 1 else None}
-            
-            return {
-                "chart_type": llm_suggestion.get("chart_type", "bar_chart"),
-                "config": config,
-                "reasoning": llm_suggestion.get("reasoning", "LLM suggested visualization")
-            }
+            return self._visualization_config(llm_suggestion, columns)
         except Exception:
             # Fallback to heuristics
             num_columns = len(columns)
             num_rows = len(data)
             
-            time_columns = [col for col in columns if any(keyword in col.lower() for keyword in ["date", "time", "year", "month", "day"])]
-            
-            numeric_columns = []
-            if data:
-                first_row = data[0]
-                for col in columns:
-                    try:
-                        float(first_row.get(col, 0))
-                        numeric_columns.append(col)
-                    except (ValueError, TypeError):
-                        pass
+            time_columns = [col for col in columns if _TIME_RE.search(col)]
+            numeric_columns = _numeric_columns(data, columns)
             
             if time_columns and numeric_columns:
                 return {"chart_type": "line_chart", "config": {"x_axis": time_columns[0], "y_axis": numeric_columns[0]}, "reasoning": "Time series data detected"}
@@ -574,7 +894,7 @@ Return JSON with: {{"chart_type": "...", "reasoning": "..."}}"""
             else:
                 return {"chart_type": "bar_chart", "config": {}, "reasoning": "Default visualization"}
     
-    def process_message(
+    async def _aprepare_message(
         self,
         user: User,
         message: str,
@@ -582,8 +902,8 @@ Return JSON with: {{"chart_type": "...", "reasoning": "..."}}"""
         datasource_id: Optional[int],
         db: Session,
         password: Optional[str] = None
-    ) -> Dict[str, Any]:
-        """Process a user message and generate response."""
+    ) -> _PreparedMessage:
+        """Record the user message, then generate, run and summarize its SQL."""
         # Get or create conversation
         if conversation_id:
             conversation = db.query(Conversation).filter(
@@ -598,6 +918,7 @@ Return JSON with: {{"chart_type": "...", "reasoning": "..."}}"""
                 user_id=user.id,
                 title=message[:50] if len(message) > 50 else message
             )
+            # The only flush before the reply: the stream reports the new id up front
             db.add(conversation)
             db.flush()
         
@@ -611,16 +932,14 @@ Return JSON with: {{"chart_type": "...", "reasoning": "..."}}"""
             ).first()
         
         # Get conversation context
-        conversation_history = self.get_conversation_context(conversation.id, db)
+        conversation_history = self.get_conversation_context(conversation.id, db) if conversation_id else []
         
-        # Save user message
-        user_message = ChatMessage(
+        # User message is saved with the reply
+        pending = [ChatMessage(
             conversation_id=conversation.id,
             role="user",
             content=message
-        )
-        db.add(user_message)
-        db.flush()
+        )]
         
         # Convert to SQL (if datasource is database type)
         sql_query = None
@@ -628,15 +947,15 @@ Return JSON with: {{"chart_type": "...", "reasoning": "..."}}"""
         
         if datasource and datasource.type in [DataSourceType.POSTGRESQL, DataSourceType.MYSQL]:
             try:
-                sql_query = self.convert_query_to_sql(
+                sql_query = await self.aconvert_query_to_sql(
                     question=message,
                     datasource=datasource,
                     conversation_history=conversation_history,
                     db=db
                 )
                 
-                # Execute query
-                query_result = self.execute_query(sql_query, datasource, password)
+                # Execute query (blocking driver call, run in a worker thread)
+                query_result = await asyncio.to_thread(self.execute_query, sql_query, datasource, password)
                 
                 # Save to query history
                 query_history = QueryHistory(
@@ -649,7 +968,7 @@ Return JSON with: {{"chart_type": "...", "reasoning": "..."}}"""
                     success="true" if query_result.get("success") else "false",
                     error_message=query_result.get("error")
                 )
-                db.add(query_history)
+                pending.append(query_history)
                 
             except Exception as e:
                 query_result = {
@@ -661,74 +980,241 @@ Return JSON with: {{"chart_type": "...", "reasoning": "..."}}"""
                 }
                 sql_query = None
         
-        # Calculate statistics and generate insights
+        # Calculate statistics
         stats = None
-        insights = None
-        suggested_queries = None
-        
         if query_result and query_result.get("success"):
             data = query_result.get("data", [])
             columns = query_result.get("columns", [])
-            
-            # Calculate statistics
             if data and columns:
                 stats = self._calculate_statistics(data, columns)
-                # Generate insights
-                insights = self._generate_insights(message, query_result, stats)
-                # Generate suggested queries
-                suggested_queries = self._generate_suggested_queries(message, query_result, columns)
-        
-        # Generate response with enhanced interpretation
-        if query_result:
-            assistant_message_text = self.generate_response(message, query_result, stats)
-        else:
-            # Handle file-based datasources
-            if datasource and datasource.type == DataSourceType.FILE:
-                assistant_message_text = self._process_file_query(user, message, datasource, db)
-            else:
-                # For non-database queries or when no datasource, provide general response
-                assistant_message_text = "I can help you query your data sources. Please specify a database datasource to execute SQL queries, or ask me about your data."
         
-        # Suggest visualization with enhanced metadata
-        visualization_suggestion = None
+        return _PreparedMessage(conversation, datasource, sql_query, query_result, stats, pending)
+    
+    async def _aanalyze(self, message: str, prepared: _PreparedMessage) -> Optional[Dict[str, Any]]:
+        """Reply, insights, follow-ups and chart from one LLM call.
+        
+        Returns None when the results need no LLM reply or the model's answer
+        is not the expected JSON, leaving the caller to use the separate calls.
+        """
+        query_result = prepared.query_result
+        columns = query_result.get("columns", [])
+        if not columns or self._canned_response(query_result) is not None:
+            return None
+        
+        try:
+            analysis_text = await self._analysis_chain.ainvoke({
+                "query": message,
+                "query_results": self._format_query_results(query_result, prepared.stats)
+            })
+            analysis = _json_loads(_unfence(analysis_text))
+            response = analysis["response"].strip()
+            insights = analysis.get("insights")
+            suggested_queries = analysis.get("suggested_queries")
+            visualization = analysis.get("visualization")
+            if not (isinstance(insights, dict) and isinstance(suggested_queries, list) and isinstance(visualization, dict)):
+                return None
+        except Exception:
+            return None
+        
+        return {
+            "message": response,
+            "visualization_suggestion": self._visualization_config(visualization, columns),
+            "insights": insights if prepared.stats else {},
+            "suggested_queries": suggested_queries[:5]
+        }
+    
+    def _extra_llm_calls(self, message: str, prepared: _PreparedMessage) -> Dict[str, Any]:
+        """Coroutines for the LLM calls that accompany the reply, keyed by result field."""
+        query_result = prepared.query_result
+        calls = {}
         if query_result and query_result.get("success"):
-            visualization_suggestion = self.suggest_visualization(message, query_result)
+            data = query_result.get("data", [])
+            columns = query_result.get("columns", [])
+            if not data or not columns:
+                return calls
+            # A single row (a count, a total) has no chart or trend worth an LLM round-trip
+            if len(data) > 1:
+                calls["visualization_suggestion"] = self.asuggest_visualization(message, query_result)
+                calls["insights"] = self._agenerate_insights(message, query_result, prepared.stats)
+            calls["suggested_queries"] = self._agenerate_suggested_queries(message, query_result, columns)
+        return calls
+    
+    async def _aplain_reply(self, user: User, message: str, prepared: _PreparedMessage, db: Session) -> str:
+        """Reply for messages that produced no query result."""
+        datasource = prepared.datasource
+        # Handle file-based datasources
+        if datasource and datasource.type == DataSourceType.FILE:
+            return await self._aprocess_file_query(user, message, datasource, db)
+        # For non-database queries or when no datasource, provide general response
+        return "I can help you query your data sources. Please specify a database datasource to execute SQL queries, or ask me about your data."
+    
+    def _save_reply(
+        self,
+        prepared: _PreparedMessage,
+        assistant_message_text: str,
+        extras: Dict[str, Any],
+        db: Session
+    ) -> Dict[str, Any]:
+        """Persist the assistant message and build the chat result."""
+        sql_query = prepared.sql_query
+        stats = prepared.stats
+        visualization_suggestion = extras.get("visualization_suggestion")
+        insights = extras.get("insights")
+        suggested_queries = extras.get("suggested_queries")
         
         # Save assistant message with enhanced metadata
         assistant_message = ChatMessage(
-            conversation_id=conversation.id,
+            conversation_id=prepared.conversation.id,
             role="assistant",
             content=assistant_message_text,
             message_metadata={
                 "sql_query": sql_query,
-                "query_result": query_result,
+                "query_result": _stored_result(prepared.query_result),
                 "visualization_suggestion": visualization_suggestion,
                 "statistical_summary": stats,
                 "insights": insights,
                 "suggested_queries": suggested_queries
             } if sql_query or stats else None
         )
-        db.add(assistant_message)
+        db.add_all(prepared.pending + [assistant_message])
         
         # Update conversation timestamp
-        conversation.updated_at = datetime.utcnow()
+        prepared.conversation.updated_at = datetime.utcnow()
+        conversation_id = prepared.conversation.id
         
+        # Both messages go out as one multi-row INSERT ... RETURNING; read the
+        # new id before commit expires it so no refresh SELECT is needed
+        db.flush()
+        message_id = assistant_message.id
         db.commit()
-        db.refresh(assistant_message)
         
         return {
             "message": assistant_message_text,
-            "conversation_id": conversation.id,
+            "conversation_id": conversation_id,
             "sql_query": sql_query,
-            "execution_result": query_result,
+            "execution_result": prepared.query_result,
             "visualization_suggestion": visualization_suggestion,
             "statistical_summary": stats,
             "insights": insights,
             "suggested_queries": suggested_queries,
-            "message_id": assistant_message.id
+            "message_id": message_id
+        }
+    
+    async def aprocess_message(
+        self,
+        user: User,
+        message: str,
+        conversation_id: Optional[int],
+        datasource_id: Optional[int],
+        db: Session,
+        password: Optional[str] = None
+    ) -> Dict[str, Any]:
+        """Process a user message and generate response."""
+        prepared = await self._aprepare_message(user, message, conversation_id, datasource_id, db, password)
+        
+        extras = {}
+        if prepared.query_result:
+            # One combined call when possible, otherwise the separate calls run together
+            extras = await self._aanalyze(message, prepared)
+            if extras is None:
+                llm_calls = {"message": self.agenerate_response(message, prepared.query_result, prepared.stats)}
+                llm_calls.update(self._extra_llm_calls(message, prepared))
+                extras = dict(zip(llm_calls, await asyncio.gather(*llm_calls.values())))
+            assistant_message_text = extras.pop("message")
+        else:
+            assistant_message_text = await self._aplain_reply(user, message, prepared, db)
+        
+        return self._save_reply(prepared, assistant_message_text, extras, db)
+    
+    async def aprocess_message_stream(
+        self,
+        user: User,
+        message: str,
+        conversation_id: Optional[int],
+        datasource_id: Optional[int],
+        db: Session,
+        password: Optional[str] = None
+    ) -> AsyncIterator[Dict[str, Any]]:
+        """Process a user message, yielding the reply as it is generated.
+        
+        Yields a "metadata" event once the SQL has run, "token" events with
+        reply text as the LLM produces it, and a final "done" event carrying
+        the same result as aprocess_message once the reply is saved.
+        """
+        prepared = await self._aprepare_message(user, message, conversation_id, datasource_id, db, password)
+        yield {
+            "event": "metadata",
+            "conversation_id": prepared.conversation.id,
+            "sql_query": prepared.sql_query,
+            "execution_result": prepared.query_result,
+            "statistical_summary": prepared.stats
         }
+        
+        extras = {}
+        if prepared.query_result:
+            # Visualization, insights and follow-ups run while the reply streams
+            llm_calls = self._extra_llm_calls(message, prepared)
+            pending = asyncio.ensure_future(asyncio.gather(*llm_calls.values()))
+            chunks = []
+            try:
+                async for chunk in self.agenerate_response_stream(message, prepared.query_result, prepared.stats):
+                    chunks.append(chunk)
+                    yield {"event": "token", "content": chunk}
+                extras = dict(zip(llm_calls, await pending))
+            finally:
+                pending.cancel()
+            assistant_message_text = "".join(chunks).strip()
+        else:
+            assistant_message_text = await self._aplain_reply(user, message, prepared, db)
+            yield {"event": "token", "content": assistant_message_text}
+        
+        yield {"event": "done", **self._save_reply(prepared, assistant_message_text, extras, db)}
+    
+    async def aprocess_messages(
+        self,
+        batch: List[ProcessInput],
+        session_factory: Callable[[], Session] = SessionLocal
+    ) -> List[Dict[str, Any]]:
+        """Process many messages concurrently, returning results in input order.
+        
+        Messages for the same conversation run in order so each sees the
+        previous reply in its context; separate conversations run in parallel,
+        at most CHATBOT_MAX_CONCURRENCY at a time, each with its own session.
+        A failed message yields {"error": ...} instead of failing the batch.
+        """
+        groups: Dict[Any, List[int]] = {}
+        for index, item in enumerate(batch):
+            key = item.conversation_id if item.conversation_id else ("new", index)
+            groups.setdefault(key, []).append(index)
+        
+        results: List[Optional[Dict[str, Any]]] = [None] * len(batch)
+        semaphore = asyncio.Semaphore(settings.CHATBOT_MAX_CONCURRENCY)
+        
+        async def run_group(indexes: List[int]):
+            async with semaphore:
+                db = session_factory()
+                try:
+                    for index in indexes:
+                        item = batch[index]
+                        try:
+                            results[index] = await self.aprocess_message(
+                                user=item.user,
+                                message=item.message,
+                                conversation_id=item.conversation_id,
+                                datasource_id=item.datasource_id,
+                                db=db,
+                                password=item.password
+                            )
+                        except Exception as e:
+                            db.rollback()
+                            results[index] = {"error": str(e), "conversation_id": item.conversation_id}
+                finally:
+                    db.close()
+        
+        await asyncio.gather(*(run_group(indexes) for indexes in groups.values()))
+        return results
     
-    def _process_file_query(
+    async def _aprocess_file_query(
         self,
         user: User,
         message: str,
@@ -737,15 +1223,18 @@ Return JSON with: {{"chart_type": "...", "reasoning": "..."}}"""
     ) -> str:
         """Process natural language queries for file-based datasources."""
         try:
-            # Get data from file
-            df = self.analytics_engine.get_data(datasource, limit=1000)
-            
-            if df.empty:
-                return "The file datasource is empty or could not be loaded."
-            
-            # Use LLM to interpret the query and generate pandas operations
-            file_query_prompt = f"""The user wants to query a CSV/Excel file with the following question:
-"{message}"
+            # Columns and sample rows only change with the file, so the prompt
+            # prefix built from them is reused until the file is rewritten
+            file_key = (datasource.id, datasource.file_path, os.path.getmtime(datasource.file_path))
+            system_text = self._file_prompt_cache.get(file_key)
+            if system_text is None:
+                # Get data from file
+                df = await asyncio.to_thread(self.analytics_engine.get_data, datasource, limit=1000)
+                
+                if df.empty:
+                    return "The file datasource is empty or could not be loaded."
+                
+                system_text = f"""The user wants to query a CSV/Excel file.
 
 Available columns: {', '.join(df.columns.tolist())}
 Number of rows: {len(df)}
@@ -755,10 +1244,23 @@ Based on the question, suggest what pandas operations would answer it. Provide a
 Sample data:
 {df.head(5).to_string()}
 
-Provide a helpful response explaining what the user can do with this data."""            response = self.llm.invoke(file_query_prompt)
-            if hasattr(response, 'content'):
-                return response.content
-            else:
-                return str(response)
+Provide a helpful response explaining what the user can do with this data."""
+                self._file_prompt_cache.set(file_key, system_text)
+            
+            # Same question wording (ignoring case and punctuation) about the same file version
+            reply_key = (file_key, " ".join(_WORD_RE.findall(message.lower())))
+            reply = self._file_reply_cache.get(reply_key)
+            if reply is not None:
+                return reply
+            
+            llm = self.llm
+            if isinstance(llm, ChatOpenAI):
+                llm = llm.bind(extra_body={"prompt_cache_key": f"intellibi-file-{datasource.id}"})
+            # The question goes last so the file prefix is identical across turns
+            response = await llm.ainvoke([SystemMessage(content=system_text), HumanMessage(content=message)])
+            reply = response.content if hasattr(response, "content") else str(response)
+            
+            self._file_reply_cache.set(reply_key, reply)
+            return reply
         except Exception as e:
             return f"I encountered an error processing your file query: {str(e)}. Please try rephrasing your question."
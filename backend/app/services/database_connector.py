@@ -1,16 +1,61 @@
-from typing import Dict, Any, Optional, List
+from typing import Dict, Any, Optional, List, Tuple
 from contextlib import contextmanager
-from sqlalchemy import create_engine, text, inspect
+from sqlalchemy import bindparam, create_engine, text, inspect
 from sqlalchemy.engine import Engine
+from sqlalchemy.sql.elements import TextClause
 from sqlalchemy.pool import QueuePool
-from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.exc import DBAPIError, InterfaceError, OperationalError, SQLAlchemyError, TimeoutError as PoolTimeoutError
 import pandas as pd
 from cryptography.fernet import Fernet
 import base64
 import hashlib
+import re
+import threading
 
+from app.core.memory_cache import MemoryCache
 from app.models.datasource import DataSource, DataSourceType
 
+try:
+    # Optional: fetches results column-wise as Arrow instead of row tuples
+    import connectorx as cx
+except ImportError:
+    cx = None
+
+
+# Database backends connectorx can read from
+_CONNECTORX_BACKENDS = {"postgresql", "mysql"}
+
+# Statements a server-side (named) cursor accepts; EXPLAIN, SHOW and DML are run plainly
+_SELECT_SQL_RE = re.compile(r"\s*(SELECT|WITH)\b", re.IGNORECASE)
+
+
+def _needs_limit(query: str, limit: Optional[int]) -> bool:
+    """Whether a row limit should be appended: a SELECT with no LIMIT of its own.
+    
+    EXPLAIN, SHOW and DML take no LIMIT and pass through unchanged.
+    """
+    return bool(limit) and "LIMIT" not in query.upper() and _SELECT_SQL_RE.match(query) is not None
+
+
+def _without_terminator(query: str) -> str:
+    """Query text with surrounding whitespace and a trailing semicolon removed."""
+    return query.strip().rstrip(";").rstrip()
+
+
+def _derive_encryption_key() -> bytes:
+    """Get or generate encryption key for password storage."""
+    # In production, this should come from environment variables
+    key = "intellibi-db-connector-key-change-in-production"
+    key_bytes = key.encode()
+    # Generate a 32-byte key using SHA256
+    return base64.urlsafe_b64encode(hashlib.sha256(key_bytes).digest())
+
+
+# The key is fixed, so it is derived once per process and every connector
+# shares one Fernet (safe to use across threads)
+_ENCRYPTION_KEY = _derive_encryption_key()
+_FERNET = Fernet(_ENCRYPTION_KEY)
+
 
 class DatabaseConnector:
     """Service for connecting to and querying external databases."""
@@ -19,33 +64,37 @@ class DatabaseConnector:
     POOL_SIZE = 5
     MAX_OVERFLOW = 10
     POOL_RECYCLE = 3600  # Recycle connections after 1 hour
+    # A SELECT 1 on every checkout costs a round-trip and misbehaves behind
+    # transaction-mode poolers; stale connections are retried instead.
+    # Datasources can opt back in with connection_config["pool_pre_ping"].
+    POOL_PRE_PING = False
+    FETCH_BATCH_SIZE = 1000  # Rows per server-side cursor fetch
+    
+    # Engines are shared by every connector so each datasource gets one pool
+    _engines: Dict[str, Engine] = {}
+    _engines_lock = threading.Lock()
+    
+    # Introspection results, shared the same way: (datasource id, table) -> result
+    SCHEMA_CACHE_TTL = 60  # seconds
+    SCHEMA_CACHE_MAXSIZE = 1024
+    _schema_cache = MemoryCache(maxsize=SCHEMA_CACHE_MAXSIZE, ttl=SCHEMA_CACHE_TTL)
     
     def __init__(self):
         """Initialize the database connector."""
-        self._engines: Dict[str, Engine] = {}
-        self._encryption_key = self._get_encryption_key()
-    
-    def _get_encryption_key(self) -> bytes:
-        """Get or generate encryption key for password storage."""
-        # In production, this should come from environment variables
-        key = "intellibi-db-connector-key-change-in-production"
-        key_bytes = key.encode()
-        # Generate a 32-byte key using SHA256
-        return base64.urlsafe_b64encode(hashlib.sha256(key_bytes).digest())
+        self._encryption_key = _ENCRYPTION_KEY
+        self._fernet = _FERNET
     
     def _encrypt_password(self, password: str) -> str:
         """Encrypt password for storage."""
         if not password:
             return ""
-        f = Fernet(self._encryption_key)
-        return f.encrypt(password.encode()).decode()
+        return self._fernet.encrypt(password.encode()).decode()
     
     def _decrypt_password(self, encrypted_password: str) -> str:
         """Decrypt password for use."""
         if not encrypted_password:
             return ""
-        f = Fernet(self._encryption_key)
-        return f.decrypt(encrypted_password.encode()).decode()
+        return self._fernet.decrypt(encrypted_password.encode()).decode()
     
     def _build_connection_string(
         self,
@@ -77,8 +126,9 @@ class DatabaseConnector:
         engine_key = self._get_engine_key(datasource.id)
         
         # Return cached engine if exists
-        if engine_key in self._engines:
-            return self._engines[engine_key]
+        engine = self._engines.get(engine_key)
+        if engine is not None:
+            return engine
         
         # Get password (decrypt if stored encrypted)
         db_password = password
@@ -100,6 +150,8 @@ class DatabaseConnector:
             password=db_password
         )
         
+        pool_pre_ping = (datasource.connection_config or {}).get("pool_pre_ping", self.POOL_PRE_PING)
+        
         # Create engine with connection pooling
         engine = create_engine(
             connection_string,
@@ -107,14 +159,17 @@ class DatabaseConnector:
             pool_size=self.POOL_SIZE,
             max_overflow=self.MAX_OVERFLOW,
             pool_recycle=self.POOL_RECYCLE,
-            pool_pre_ping=True,  # Verify connections before using
+            pool_pre_ping=pool_pre_ping,
             echo=False
         )
         
-        # Cache engine
-        self._engines[engine_key] = engine
+        # Cache engine; keep the first one if another thread raced us here
+        with self._engines_lock:
+            cached = self._engines.setdefault(engine_key, engine)
+        if cached is not engine:
+            engine.dispose()
         
-        return engine
+        return cached
     
     def test_connection(self, datasource: DataSource, password: Optional[str] = None) -> Dict[str, Any]:
         """Test database connection."""
@@ -147,71 +202,153 @@ class DatabaseConnector:
         finally:
             conn.close()
     
+    def _prepare_statement(self, query: str, params: Optional[Dict[str, Any]]) -> TextClause:
+        """Wrap a query in text(), expanding list-valued parameters for IN clauses."""
+        statement = text(query)
+        expanding = [
+            bindparam(name, expanding=True)
+            for name, value in (params or {}).items()
+            if isinstance(value, (list, tuple))
+        ]
+        if expanding:
+            statement = statement.bindparams(*expanding)
+        return statement
+    
     def execute_query(
         self,
         datasource: DataSource,
         query: str,
         password: Optional[str] = None,
-        limit: Optional[int] = None
+        limit: Optional[int] = None,
+        params: Optional[Dict[str, Any]] = None,
+        max_rows: Optional[int] = None
     ) -> Dict[str, Any]:
-        """Execute a SQL query and return results."""
+        """Execute a SQL query and return results.
+        
+        With max_rows only that many rows are kept; "truncated" tells
+        whether more were left.
+        """
         try:
-            # Add LIMIT if specified and not already present
-            if limit and "LIMIT" not in query.upper():
-                query = f"{query.rstrip(';')} LIMIT {limit}"
+            # Add LIMIT to SELECTs that have none; the row cap is a bound
+            # parameter so the statement text stays the same whatever the limit
+            if _needs_limit(query, limit):
+                query = f"{_without_terminator(query)} LIMIT :_row_limit"
+                params = {**(params or {}), "_row_limit": int(limit)}
             
-            with self.get_connection(datasource, password) as conn:
-                result = conn.execute(text(query))
-                
-                # Get column names
-                columns = list(result.keys())
-                
-                # Fetch all rows
-                rows = result.fetchall()
-                
-                # Convert to list of dicts
-                data = [dict(zip(columns, row)) for row in rows]
-                
-                return {
-                    "success": True,
-                    "columns": columns,
-                    "data": data,
-                    "row_count": len(data),
-                    "query": query
-                }
+            try:
+                columns, data, truncated = self._fetch_rows(datasource, password, query, params, max_rows)
+            except DBAPIError as e:
+                # Without pre-ping a pooled connection may have gone stale; the
+                # pool has dropped it, so a second try gets a fresh one
+                if not e.connection_invalidated:
+                    raise
+                columns, data, truncated = self._fetch_rows(datasource, password, query, params, max_rows)
+            
+            return {
+                "success": True,
+                "columns": columns,
+                "data": data,
+                "row_count": len(data),
+                "truncated": truncated,
+                "query": query
+            }
         except SQLAlchemyError as e:
             return {
                 "success": False,
                 "error": str(e),
+                # Dropped connections and pool timeouts may pass; bad SQL will not
+                "retriable": isinstance(e, (OperationalError, InterfaceError, PoolTimeoutError)),
                 "message": "Query execution failed"
             }
     
+    def _fetch_rows(
+        self,
+        datasource: DataSource,
+        password: Optional[str],
+        query: str,
+        params: Optional[Dict[str, Any]],
+        max_rows: Optional[int]
+    ) -> Tuple[List[str], List[Dict[str, Any]], bool]:
+        """Run a query on a pooled connection; returns columns, row dicts and whether rows were cut off.
+        
+        SELECT rows come from a server-side cursor in batches and are turned
+        into dicts as they arrive, so the raw row tuples are never held in full.
+        """
+        with self.get_connection(datasource, password) as conn:
+            if _SELECT_SQL_RE.match(query):
+                conn = conn.execution_options(stream_results=True, yield_per=self.FETCH_BATCH_SIZE)
+            result = conn.execute(self._prepare_statement(query, params), params or {})
+            
+            # Get column names
+            columns = list(result.keys())
+            rows = result.mappings()
+            
+            if not max_rows:
+                return columns, [dict(row) for row in rows], False
+            
+            # One extra row tells whether the cap cut anything off
+            data = [dict(row) for row in rows.fetchmany(max_rows + 1)]
+            result.close()
+            return columns, data[:max_rows], len(data) > max_rows
+    
     def execute_query_dataframe(
         self,
         datasource: DataSource,
         query: str,
         password: Optional[str] = None,
-        limit: Optional[int] = None
+        limit: Optional[int] = None,
+        params: Optional[Dict[str, Any]] = None
     ) -> pd.DataFrame:
         """Execute a SQL query and return results as pandas DataFrame."""
         try:
             engine = self.create_engine(datasource, password)
             
-            # Add LIMIT if specified
-            if limit and "LIMIT" not in query.upper():
-                query = f"{query.rstrip(';')} LIMIT {limit}"
+            # Add LIMIT to SELECTs that have none, as execute_query does
+            limited = _needs_limit(query, limit)
             
-            df = pd.read_sql(query, engine)
+            if cx is not None and not params:
+                # connectorx takes no bound parameters; the limit is an int, so inline it
+                arrow_query = f"{_without_terminator(query)} LIMIT {int(limit)}" if limited else query
+                df = self._read_sql_arrow(engine, arrow_query)
+                if df is not None:
+                    return df
+            
+            if limited:
+                query = f"{_without_terminator(query)} LIMIT :_row_limit"
+                params = {**(params or {}), "_row_limit": int(limit)}
+            
+            if params:
+                # Named :placeholders are resolved by SQLAlchemy's text()
+                df = pd.read_sql(self._prepare_statement(query, params), engine, params=params)
+            else:
+                df = pd.read_sql(query, engine)
             return df
         except Exception as e:
             raise ValueError(f"Query execution failed: {str(e)}")
     
+    def _read_sql_arrow(self, engine: Engine, query: str) -> Optional[pd.DataFrame]:
+        """Fetch a query through connectorx as Arrow; None if its backend is not supported.
+        
+        Query errors propagate rather than re-running the query through pandas.
+        """
+        backend = engine.url.get_backend_name()
+        if backend not in _CONNECTORX_BACKENDS:
+            return None
+        # connectorx takes plain backend URLs (postgresql://, mysql://)
+        url = engine.url.set(drivername=backend)
+        table = cx.read_sql(url.render_as_string(hide_password=False), query, return_type="arrow")
+        return table.to_pandas(split_blocks=True, self_destruct=True)
+    
     def get_tables(self, datasource: DataSource, password: Optional[str] = None) -> List[str]:
         """Get list of tables in the database."""
+        key = (datasource.id, None)
+        tables = self._schema_cache.get(key)
+        if tables is not None:
+            return tables
         try:
-            engine = self.create_engine(datasource, password)
-            inspector = inspect(engine)
-            tables = inspector.get_table_names()
+            with self.get_connection(datasource, password) as conn:
+                tables = inspect(conn).get_table_names()
+            self._schema_cache.set(key, tables)
             return tables
         except Exception as e:
             raise ValueError(f"Failed to get tables: {str(e)}")
@@ -223,15 +360,20 @@ class DatabaseConnector:
         password: Optional[str] = None
     ) -> Dict[str, Any]:
         """Get schema information for a specific table."""
+        key = (datasource.id, table_name)
+        schema = self._schema_cache.get(key)
+        if schema is not None:
+            return schema
         try:
-            engine = self.create_engine(datasource, password)
-            inspector = inspect(engine)
-            
-            columns = inspector.get_columns(table_name)
-            primary_keys = inspector.get_primary_keys(table_name)
-            foreign_keys = inspector.get_foreign_keys(table_name)
+            # An inspector over an Engine checks out a connection per call;
+            # bound to one connection the three lookups share it
+            with self.get_connection(datasource, password) as conn:
+                inspector = inspect(conn)
+                columns = inspector.get_columns(table_name)
+                primary_keys = inspector.get_pk_constraint(table_name)["constrained_columns"]
+                foreign_keys = inspector.get_foreign_keys(table_name)
             
-            return {
+            schema = {
                 "table_name": table_name,
                 "columns": [
                     {
@@ -253,18 +395,25 @@ class DatabaseConnector:
                     for fk in foreign_keys
                 ]
             }
+            self._schema_cache.set(key, schema)
+            return schema
         except Exception as e:
             raise ValueError(f"Failed to get table schema: {str(e)}")
     
     def close_connection(self, datasource_id: int):
         """Close and remove connection pool for a datasource."""
         engine_key = self._get_engine_key(datasource_id)
-        if engine_key in self._engines:
-            engine = self._engines.pop(engine_key)
+        with self._engines_lock:
+            engine = self._engines.pop(engine_key, None)
+        if engine is not None:
             engine.dispose()
+        self._schema_cache.invalidate(lambda key: key[0] == datasource_id)
     
     def close_all_connections(self):
         """Close all connection pools."""
-        for engine_key, engine in list(self._engines.items()):
+        with self._engines_lock:
+            engines = list(self._engines.values())
+            self._engines.clear()
+        for engine in engines:
             engine.dispose()
-        self._engines.clear()
+        self._schema_cache.clear()
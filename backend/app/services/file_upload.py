@@ -1,4 +1,5 @@
 import os
+from datetime import datetime, timezone
 import pandas as pd
 import numpy as np
 from typing import Dict, Any, Optional, Tuple
@@ -7,6 +8,34 @@ from pathlib import Path
 
 from app.core.config import settings
 
+try:
+    # Optional: lets pandas parse CSVs with Arrow's multithreaded reader
+    import pyarrow as pa
+except ImportError:
+    pa = None
+
+try:
+    # Optional: Rust-backed Excel reader for pandas.read_excel, which also reads legacy .xls
+    import python_calamine
+except ImportError:
+    python_calamine = None
+
+
+def downcast_numeric(df: pd.DataFrame) -> pd.DataFrame:
+    """Narrow integer and float columns to the smallest dtype that fits.
+    
+    Float columns become float32 only when every value survives the round
+    trip exactly, so prices like 19.99 keep their float64 precision.
+    """
+    downcast = {}
+    for column in df.select_dtypes(include="integer").columns:
+        downcast[column] = pd.to_numeric(df[column], downcast="integer")
+    for column in df.select_dtypes(include="float").columns:
+        narrowed = df[column].astype("float32")
+        if narrowed.astype(df[column].dtype).equals(df[column]):
+            downcast[column] = narrowed
+    return df.assign(**downcast) if downcast else df
+
 
 class FileUploadService:
     """Service for handling file uploads, parsing, and validation."""
@@ -14,9 +43,17 @@ class FileUploadService:
     # Allowed file extensions
     ALLOWED_EXTENSIONS = {".csv", ".xlsx", ".xls"}
     MAX_FILE_SIZE = 50 * 1024 * 1024  # 50MB
+    CHUNK_SIZE = 1024 * 1024  # Upload bytes read per step while saving
+    NUMERIC_PROBE_ROWS = 100  # Leading values checked before parsing a whole column as numbers
     
-    def __init__(self, upload_dir: str = "uploads"):
-        """Initialize the file upload service."""
+    def __init__(self, upload_dir: str = "uploads", optimize_dtypes: bool = False):
+        """Initialize the file upload service.
+        
+        With ``optimize_dtypes`` parsed numeric columns are narrowed to the
+        smallest dtype that holds their values. It is off by default: narrow
+        integers can overflow in later arithmetic on the frame.
+        """
+        self.optimize_dtypes = optimize_dtypes
         self.upload_dir = Path(upload_dir)
         self.upload_dir.mkdir(parents=True, exist_ok=True)
     
@@ -46,24 +83,28 @@ class FileUploadService:
         user_dir.mkdir(parents=True, exist_ok=True)
         
         # Generate unique filename
-        file_ext = Path(file.filename).suffix.lower()
-        file_name = f"{Path(file.filename).stem}_{pd.Timestamp.now().strftime('%Y%m%d_%H%M%S')}{file_ext}"
+        upload_name = Path(file.filename)
+        file_ext = upload_name.suffix.lower()
+        file_name = f"{upload_name.stem}_{datetime.now(timezone.utc).strftime('%Y%m%d_%H%M%S')}{file_ext}"
         file_path = user_dir / file_name
         
-        # Save file
+        # Save file a chunk at a time, stopping as soon as it is too large
         file_size = 0
+        too_large = False
         with open(file_path, "wb") as f:
-            content = await file.read()
-            file_size = len(content)
-            
-            if file_size > self.MAX_FILE_SIZE:
-                os.remove(file_path)
-                raise HTTPException(
-                    status_code=status.HTTP_400_BAD_REQUEST,
-                    detail=f"File size exceeds maximum allowed size of {self.MAX_FILE_SIZE / (1024*1024):.1f}MB"
-                )
-            
-            f.write(content)
+            while chunk := await file.read(self.CHUNK_SIZE):
+                file_size += len(chunk)
+                if file_size > self.MAX_FILE_SIZE:
+                    too_large = True
+                    break
+                f.write(chunk)
+        
+        if too_large:
+            os.remove(file_path)
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=f"File size exceeds maximum allowed size of {self.MAX_FILE_SIZE / (1024*1024):.1f}MB"
+            )
         
         return {
             "file_path": str(file_path),
@@ -79,20 +120,28 @@ class FileUploadService:
         
         try:
             if file_ext == ".csv":
-                df = pd.read_csv(file_path, encoding="utf-8")
+                df = self._read_csv(file_path)
             elif file_ext in [".xlsx", ".xls"]:
-                df = pd.read_excel(file_path, engine="openpyxl")
+                df = pd.read_excel(file_path, engine="calamine" if python_calamine is not None else "openpyxl")
             else:
                 raise ValueError(f"Unsupported file type: {file_ext}")
             
+            if self.optimize_dtypes:
+                df = downcast_numeric(df)
+            
+            # One null scan serves both the per-column counts and the overall flag
+            null_counts = df.isna().sum()
+            
             # Get metadata
             metadata = {
                 "row_count": len(df),
                 "column_count": len(df.columns),
                 "columns": df.columns.tolist(),
                 "dtypes": {col: str(dtype) for col, dtype in df.dtypes.items()},
-                "has_nulls": df.isnull().any().any(),
-                "null_counts": df.isnull().sum().to_dict(),
+                "has_nulls": bool(null_counts.any()),
+                "null_counts": null_counts.to_dict(),
+                # Shallow count: cheap, and it is the numeric columns that shrink
+                "memory_usage_bytes": int(df.memory_usage().sum()),
             }
             
             return df, metadata
@@ -103,32 +152,50 @@ class FileUploadService:
                 detail=f"Error parsing file: {str(e)}"
             )
     
+    def _read_csv(self, file_path: str) -> pd.DataFrame:
+        """Read a CSV, through pyarrow when it is installed."""
+        if pa is not None:
+            try:
+                return pd.read_csv(file_path, encoding="utf-8", engine="pyarrow")
+            except pa.ArrowInvalid:
+                # Arrow is stricter about ragged rows and odd quoting; pandas' own parser copes
+                pass
+        return pd.read_csv(file_path, encoding="utf-8")
+    
     def clean_data(self, df: pd.DataFrame) -> pd.DataFrame:
         """Clean and validate data."""
-        # Make a copy to avoid modifying original
-        df_cleaned = df.copy()
+        # Remove completely empty rows and columns
+        df = df.dropna(how="all").dropna(axis=1, how="all")
         
-        # Remove completely empty rows
-        df_cleaned = df_cleaned.dropna(how="all")
-        
-        # Remove completely empty columns
-        df_cleaned = df_cleaned.dropna(axis=1, how="all")
-        
-        # Strip whitespace from string columns
-        for col in df_cleaned.select_dtypes(include=["object"]).columns:
-            df_cleaned[col] = df_cleaned[col].astype(str).str.strip()
+        # Cleaned text columns by position, so duplicate column names survive
+        cleaned = {}
+        for position, dtype in enumerate(df.dtypes):
+            if dtype != object:
+                continue
+            values = df.iloc[:, position]
+            # Strip whitespace; pure text columns skip the str() pass, and missing stays missing
+            if pd.api.types.infer_dtype(values, skipna=True) == "string":
+                values = values.str.strip()
+            else:
+                values = values.astype(str).str.strip().where(values.notna())
             # Replace empty strings with NaN
-            df_cleaned[col] = df_cleaned[col].replace("", np.nan)
-        
-        # Convert numeric columns, handling errors
-        for col in df_cleaned.columns:
-            if df_cleaned[col].dtype == "object":
-                # Try to convert to numeric
-                numeric_series = pd.to_numeric(df_cleaned[col], errors="coerce")
+            values = values.replace("", np.nan)
+            
+            # Convert numeric columns, unless the leading values show it is text
+            probe = values.dropna().head(self.NUMERIC_PROBE_ROWS)
+            if not probe.empty and pd.to_numeric(probe, errors="coerce").notna().any():
+                numeric_series = pd.to_numeric(values, errors="coerce")
                 if not numeric_series.isna().all():
-                    df_cleaned[col] = numeric_series
+                    values = numeric_series
+            cleaned[position] = values
         
-        return df_cleaned
+        if not cleaned:
+            return df
+        # Assemble the frame once instead of splitting its blocks on every column assignment
+        return pd.concat(
+            [cleaned.get(position, df.iloc[:, position]) for position in range(df.shape[1])],
+            axis=1
+        )
     
     def validate_data(self, df: pd.DataFrame) -> Tuple[bool, Optional[str]]:
         """Validate parsed data."""
@@ -1,6 +1,7 @@
 """
 Quick script to create or verify test users exist.
-Run this to ensure test users are available.
+Run this to ensure test users are available; pass --no-verify to skip
+re-checking the passwords of users that already exist.
 """
 import sys
 from pathlib import Path
@@ -14,11 +15,20 @@ from app.models.user import User, UserRole
 from app.core.security import get_password_hash, verify_password
 
 
-def create_or_verify_users(db: Session):
-    """Create test users if they don't exist."""
+def create_or_verify_users(db: Session, verify: bool = True):
+    """Create test users if they don't exist.
+    
+    Checking an existing user's password runs the full bcrypt hash, so
+    ``verify=False`` leaves existing users untouched.
+    """
+    # Look up both test users in one query
+    existing_users = {
+        user.username: user
+        for user in db.query(User).filter(User.username.in_(["admin", "user"]))
+    }
     
     # Admin user
-    admin_user = db.query(User).filter(User.username == "admin").first()
+    admin_user = existing_users.get("admin")
     if not admin_user:
         admin_user = User(
             email="admin@intellibi.com",
@@ -31,6 +41,8 @@ def create_or_verify_users(db: Session):
         )
         db.add(admin_user)
         print("✓ Created admin user")
+    elif not verify:
+        print("✓ Admin user exists")
     else:
         # Verify password works
         if verify_password("admin123", admin_user.hashed_password):
@@ -41,7 +53,7 @@ def create_or_verify_users(db: Session):
             print("✓ Updated admin user password")
     
     # Regular user
-    regular_user = db.query(User).filter(User.username == "user").first()
+    regular_user = existing_users.get("user")
     if not regular_user:
         regular_user = User(
             email="user@intellibi.com",
@@ -54,6 +66,8 @@ def create_or_verify_users(db: Session):
         )
         db.add(regular_user)
         print("✓ Created regular user")
+    elif not verify:
+        print("✓ Regular user exists")
     else:
         # Verify password works
         if verify_password("user123", regular_user.hashed_password):
@@ -73,7 +87,7 @@ def create_or_verify_users(db: Session):
 if __name__ == "__main__":
     db = SessionLocal()
     try:
-        create_or_verify_users(db)
+        create_or_verify_users(db, verify="--no-verify" not in sys.argv[1:])
     except Exception as e:
         print(f"❌ Error: {e}")
         import traceback
@@ -12,10 +12,19 @@ from app.core.security import get_password_hash
 
 
 def create_seed_data(db: Session):
-    """Create seed data for development."""
+    """Create seed data for development.
+    
+    Everything is written in one transaction; flush() assigns the ids that
+    later rows refer to without committing in between.
+    """
+    # Look up both seed users in one query
+    existing_users = {
+        user.email: user
+        for user in db.query(User).filter(User.email.in_(["admin@intellibi.com", "user@intellibi.com"]))
+    }
     
     # Create admin user
-    admin_user = db.query(User).filter(User.email == "admin@intellibi.com").first()
+    admin_user = existing_users.get("admin@intellibi.com")
     if not admin_user:
         admin_user = User(
             email="admin@intellibi.com",
@@ -27,12 +36,11 @@ def create_seed_data(db: Session):
             role=UserRole.ADMIN
         )
         db.add(admin_user)
-        db.commit()
-        db.refresh(admin_user)
+        db.flush()
         print(f"Created admin user: {admin_user.email}")
     
     # Create regular user
-    regular_user = db.query(User).filter(User.email == "user@intellibi.com").first()
+    regular_user = existing_users.get("user@intellibi.com")
     if not regular_user:
         regular_user = User(
             email="user@intellibi.com",
@@ -44,8 +52,6 @@ def create_seed_data(db: Session):
             role=UserRole.USER
         )
         db.add(regular_user)
-        db.commit()
-        db.refresh(regular_user)
         print(f"Created regular user: {regular_user.email}")
     
     # Create sample data source
@@ -60,8 +66,7 @@ def create_seed_data(db: Session):
             owner_id=admin_user.id
         )
         db.add(sample_datasource)
-        db.commit()
-        db.refresh(sample_datasource)
+        db.flush()
         print(f"Created sample data source: {sample_datasource.name}")
     
     # Create sample dashboard
@@ -76,8 +81,7 @@ def create_seed_data(db: Session):
             owner_id=admin_user.id
         )
         db.add(sample_dashboard)
-        db.commit()
-        db.refresh(sample_dashboard)
+        db.flush()
         print(f"Created sample dashboard: {sample_dashboard.name}")
         
         # Create sample widget
@@ -94,9 +98,9 @@ def create_seed_data(db: Session):
             datasource_id=sample_datasource.id
         )
         db.add(sample_widget)
-        db.commit()
         print(f"Created sample widget: {sample_widget.name}")
     
+    db.commit()
     print("\nSeed data creation completed!")
 
 
@@ -0,0 +1,400 @@
+"""Unit tests for app.services.analytics."""
+import pytest
+from unittest.mock import MagicMock
+import pandas as pd
+from sqlalchemy import create_engine, text
+
+from app.models.datasource import DataSourceType
+from app.services.analytics import (
+    AggregationFunction,
+    AnalyticsEngine,
+    FilterOperator,
+    QueryBuilder,
+    TimeInterval,
+)
+
+
+@pytest.fixture
+def engine(tmp_path, monkeypatch):
+    # FileUploadService creates its upload directory relative to the cwd
+    monkeypatch.chdir(tmp_path)
+    return AnalyticsEngine()
+
+
+@pytest.fixture
+def sales_df():
+    return pd.DataFrame({
+        "region": ["north", "south", "north", "east", None],
+        "product": ["apple", "banana", "cherry", "apple pie", "kiwi"],
+        "amount": [10, 25, 40, 5, 60],
+    })
+
+
+class TestFilterData:
+    def test_combines_filters_with_and(self, engine, sales_df):
+        result = engine.filter_data(sales_df, [
+            {"column": "region", "operator": "eq", "value": "north"},
+            {"column": "amount", "operator": "gt", "value": 15},
+        ])
+        assert result["amount"].tolist() == [40]
+
+    def test_between_in_and_null_operators(self, engine, sales_df):
+        assert engine.filter_data(
+            sales_df, [{"column": "amount", "operator": "between", "value": [10, 40]}]
+        )["amount"].tolist() == [10, 25, 40]
+        assert engine.filter_data(
+            sales_df, [{"column": "region", "operator": "not_in", "value": ["north"]}]
+        )["amount"].tolist() == [25, 5, 60]
+        assert engine.filter_data(
+            sales_df, [{"column": "region", "operator": "is_null", "value": None}]
+        )["amount"].tolist() == [60]
+
+    def test_numeric_comparisons_skip_missing_values(self, engine):
+        df = pd.DataFrame({"score": [1.5, None, 7.0, 3.0]})
+        result = engine.filter_data(df, [
+            {"column": "score", "operator": "gte", "value": 1},
+            {"column": "score", "operator": "between", "value": [2, 8]},
+        ])
+        assert result["score"].tolist() == [7.0, 3.0]
+
+    def test_like_matches_substring(self, engine, sales_df):
+        result = engine.filter_data(sales_df, [{"column": "product", "operator": "like", "value": "apple"}])
+        assert result["product"].tolist() == ["apple", "apple pie"]
+
+    def test_like_treats_wildcards_as_literals_by_default(self, engine):
+        df = pd.DataFrame({"label": ["50% off", "500 off", "a_b", "ab"]})
+        result = engine.filter_data(df, [{"column": "label", "operator": "like", "value": "0%"}])
+        assert result["label"].tolist() == ["50% off"]
+        result = engine.filter_data(df, [{"column": "label", "operator": "like", "value": "_"}])
+        assert result["label"].tolist() == ["a_b"]
+
+    def test_like_pattern_honours_sql_wildcards(self, engine, sales_df):
+        result = engine.filter_data(
+            sales_df, [{"column": "product", "operator": "like", "value": "a%e", "pattern": True}]
+        )
+        assert result["product"].tolist() == ["apple", "apple pie"]
+        result = engine.filter_data(
+            sales_df, [{"column": "product", "operator": "like", "value": "k_wi", "pattern": True}]
+        )
+        assert result["product"].tolist() == ["kiwi"]
+        result = engine.filter_data(
+            sales_df, [{"column": "product", "operator": "like", "value": "apple", "pattern": True}]
+        )
+        assert result["product"].tolist() == ["apple"]
+
+    def test_like_on_non_string_column(self, engine, sales_df):
+        result = engine.filter_data(sales_df, [{"column": "amount", "operator": "like", "value": "0"}])
+        assert result["amount"].tolist() == [10, 40, 60]
+
+    def test_unknown_columns_are_ignored(self, engine, sales_df):
+        result = engine.filter_data(sales_df, [{"column": "missing", "operator": "eq", "value": 1}])
+        assert result is sales_df
+
+    def test_no_filters_returns_input(self, engine, sales_df):
+        assert engine.filter_data(sales_df, []) is sales_df
+
+    def test_no_match_returns_empty_frame_with_columns(self, engine, sales_df):
+        result = engine.filter_data(sales_df, [{"column": "amount", "operator": "lt", "value": 0}])
+        assert result.empty
+        assert result.columns.tolist() == sales_df.columns.tolist()
+
+
+class TestAggregateData:
+    def test_whole_frame_aggregation_is_single_row(self, engine, sales_df):
+        result = engine.aggregate_data(sales_df, aggregations={
+            "amount": [AggregationFunction.SUM, AggregationFunction.AVG],
+            "region": [AggregationFunction.COUNT],
+            "missing": [AggregationFunction.SUM],
+        })
+        assert result.columns.tolist() == ["amount_sum", "amount_avg", "region_count"]
+        assert result.iloc[0].tolist() == [140, 28, 4]
+
+    def test_grouped_aggregation_keeps_every_function(self, engine, sales_df):
+        result = engine.aggregate_data(sales_df, group_by=["region"], aggregations={
+            "amount": [AggregationFunction.MIN, AggregationFunction.MAX],
+        })
+        north = result[result["region"] == "north"].iloc[0]
+        assert (north["amount_min"], north["amount_max"]) == (10, 40)
+
+    def test_grouped_without_aggregations_counts_rows(self, engine, sales_df):
+        result = engine.aggregate_data(sales_df, group_by=["region"])
+        assert result.set_index("region")["count"].to_dict() == {"east": 1, "north": 2, "south": 1}
+
+
+class TestQueryBuilder:
+    def test_build_assembles_clauses_in_order(self):
+        query = (
+            QueryBuilder("sales")
+            .select('"region"')
+            .aggregate("amount", AggregationFunction.SUM)
+            .where("amount", FilterOperator.GT, 5)
+            .group_by("region")
+            .order_by('"region"')
+            .limit(10)
+        )
+        assert query.build() == (
+            'SELECT "region", SUM("amount") AS "sum_amount" FROM "sales" '
+            'WHERE "amount" > :p0 GROUP BY "region" ORDER BY "region" ASC LIMIT 10'
+        )
+        assert query.params == {"p0": 5}
+
+    def test_in_lists_and_between_are_bound(self):
+        query = (
+            QueryBuilder("sales")
+            .where("region", FilterOperator.IN, ["north", "o'brien"])
+            .where("amount", FilterOperator.BETWEEN, [1, 9])
+        )
+        assert query.build() == (
+            'SELECT * FROM "sales" WHERE "region" IN :p0 AND "amount" BETWEEN :p1 AND :p2'
+        )
+        assert query.params == {"p0": ["north", "o'brien"], "p1": 1, "p2": 9}
+
+    def test_build_reflects_later_mutations(self):
+        query = QueryBuilder("sales")
+        assert query.build() == 'SELECT * FROM "sales"'
+        query.limit(5)
+        assert query.build() == 'SELECT * FROM "sales" LIMIT 5'
+
+
+class TestAggregateDataSource:
+    def test_postgres_source_pushes_work_into_sql(self, engine):
+        engine.db_connector = MagicMock()
+        engine.db_connector.execute_query_dataframe.return_value = pd.DataFrame(
+            {"sold_at": [], "region": [], "amount_sum": [], "amount_std": []}
+        )
+        datasource = MagicMock(type=DataSourceType.POSTGRESQL, connection_config={"table_name": "sales"})
+        engine.aggregate_data_source(
+            datasource,
+            group_by=["region"],
+            aggregations={"amount": [AggregationFunction.SUM, AggregationFunction.STD]},
+            filters=[{"column": "amount", "operator": "gt", "value": 3}],
+            time_column="sold_at",
+            interval=TimeInterval.MONTH,
+        )
+        call = engine.db_connector.execute_query_dataframe.call_args.kwargs
+        query = call["query"]
+        assert query == (
+            'SELECT date_trunc(\'month\', "sold_at") AS "sold_at", "region", '
+            'SUM("amount") AS "amount_sum", STDDEV_SAMP("amount") AS "amount_std" '
+            'FROM "sales" WHERE "sold_at" IS NOT NULL AND "amount" > :p0 '
+            'GROUP BY date_trunc(\'month\', "sold_at"), "region" '
+            'ORDER BY date_trunc(\'month\', "sold_at") ASC, "region" ASC'
+        )
+        assert call["params"] == {"p0": 3}
+
+    def test_mysql_source_uses_backticks_and_date_arithmetic(self, engine):
+        engine.db_connector = MagicMock()
+        engine.db_connector.execute_query_dataframe.return_value = pd.DataFrame({"sold_at": [], "count": []})
+        datasource = MagicMock(type=DataSourceType.MYSQL, connection_config={"table_name": "sales"})
+        engine.aggregate_data_source(datasource, time_column="sold_at", interval=TimeInterval.YEAR)
+        query = engine.db_connector.execute_query_dataframe.call_args.kwargs["query"]
+        assert query == (
+            "SELECT MAKEDATE(YEAR(`sold_at`), 1) AS `sold_at`, COUNT(*) AS `count` "
+            "FROM `sales` WHERE `sold_at` IS NOT NULL "
+            "GROUP BY MAKEDATE(YEAR(`sold_at`), 1) ORDER BY MAKEDATE(YEAR(`sold_at`), 1) ASC"
+        )
+
+    def test_like_filters_follow_the_pandas_rule(self, engine):
+        engine.db_connector = MagicMock()
+        datasource = MagicMock(type=DataSourceType.POSTGRESQL, connection_config={"table_name": "sales"})
+        engine.aggregate_data_source(
+            datasource,
+            group_by=["region"],
+            filters=[
+                {"column": "product", "operator": "like", "value": "50%_off"},
+                {"column": "product", "operator": "like", "value": "a%e", "pattern": True},
+            ],
+        )
+        call = engine.db_connector.execute_query_dataframe.call_args.kwargs
+        assert call["params"] == {"p0": "%50\\%\\_off%", "p1": "a%e"}
+
+    def test_limit_samples_rows_before_aggregating(self, engine):
+        engine.db_connector = MagicMock()
+        datasource = MagicMock(type=DataSourceType.POSTGRESQL, connection_config={"table_name": "sales"})
+        engine.aggregate_data_source(
+            datasource,
+            group_by=["region"],
+            filters=[{"column": "amount", "operator": "regex", "value": "x"}],
+            limit=100,
+        )
+        query = engine.db_connector.execute_query_dataframe.call_args.kwargs["query"]
+        assert query == (
+            'SELECT "region", COUNT(*) AS "count" FROM (SELECT * FROM "sales" LIMIT 100) AS "sales" '
+            'GROUP BY "region" ORDER BY "region" ASC'
+        )
+
+    @pytest.mark.parametrize("interval", [TimeInterval.HOUR, TimeInterval.MONTH])
+    def test_mysql_buckets_match_pandas_path(self, engine, interval):
+        raw = pd.DataFrame({
+            "sold_at": pd.to_datetime(["2024-01-01 09:15", "2024-01-01 09:45", "2024-03-01 12:00"]),
+            "amount": [1, 2, 4],
+        })
+        # Rows as MySQL returns them: sub-day buckets are DATE_FORMAT strings
+        # and calendar buckets are the first day of the period
+        sql_rows = {
+            TimeInterval.HOUR: pd.DataFrame({
+                "sold_at": ["2024-01-01 09:00:00", "2024-03-01 12:00:00"],
+                "amount_sum": [3, 4],
+            }),
+            TimeInterval.MONTH: pd.DataFrame({
+                "sold_at": ["2024-01-01", "2024-03-01"],
+                "amount_sum": [3, 4],
+            }),
+        }[interval]
+        engine.db_connector = MagicMock()
+        engine.db_connector.execute_query_dataframe.return_value = sql_rows
+        datasource = MagicMock(type=DataSourceType.MYSQL, connection_config={"table_name": "sales"})
+        pushed = engine.aggregate_data_source(
+            datasource,
+            aggregations={"amount": [AggregationFunction.SUM]},
+            time_column="sold_at",
+            interval=interval,
+        )
+        expected = engine.process_time_series(
+            raw,
+            time_column="sold_at",
+            interval=interval,
+            aggregations={"amount": [AggregationFunction.SUM]},
+        )
+        pd.testing.assert_frame_equal(pushed, expected, check_dtype=False, check_freq=False)
+
+    def test_median_falls_back_to_pandas(self, engine, sales_df):
+        engine.db_connector = MagicMock()
+        engine.get_data = MagicMock(return_value=sales_df)
+        datasource = MagicMock(type=DataSourceType.POSTGRESQL, connection_config={"table_name": "sales"})
+        result = engine.aggregate_data_source(
+            datasource, aggregations={"amount": [AggregationFunction.MEDIAN]}
+        )
+        engine.db_connector.execute_query_dataframe.assert_not_called()
+        assert result["amount_median"].tolist() == [25]
+
+
+class TestProcessTimeSeries:
+    @pytest.fixture
+    def events_df(self):
+        return pd.DataFrame({
+            "ts": ["2024-01-02 10:05", "2024-01-01 09:00", "2024-01-02 11:00", "not a date"],
+            "region": ["north", "south", "north", "north"],
+            "amount": [1, 2, 3, 4],
+        })
+
+    def test_fixed_interval_buckets_are_sorted_by_time(self, engine, events_df):
+        result = engine.process_time_series(
+            events_df,
+            time_column="ts",
+            interval=TimeInterval.DAY,
+            aggregations={"amount": [AggregationFunction.SUM, AggregationFunction.MAX]},
+            group_by=["region"],
+        )
+        assert result.columns.tolist() == ["ts", "region", "amount_sum", "amount_max"]
+        assert result["ts"].dt.day.tolist() == [1, 2]
+        assert result["amount_sum"].tolist() == [2, 4]
+
+    def test_defaults_to_row_count(self, engine, events_df):
+        result = engine.process_time_series(events_df, time_column="ts", interval=TimeInterval.DAY)
+        assert result["count"].tolist() == [1, 2]
+
+    def test_fixed_interval_keeps_empty_buckets(self, engine, events_df):
+        result = engine.process_time_series(
+            events_df,
+            time_column="ts",
+            interval=TimeInterval.HOUR,
+            aggregations={"amount": [AggregationFunction.SUM, AggregationFunction.MAX]},
+        )
+        expected = events_df.assign(ts=pd.to_datetime(events_df["ts"], errors="coerce"))
+        expected = expected.dropna(subset=["ts"]).set_index("ts").resample("h")["amount"].agg(["sum", "max"])
+        assert len(result) == 27
+        assert result["ts"].tolist() == expected.index.tolist()
+        assert result["amount_sum"].tolist() == expected["sum"].tolist()
+        assert result["amount_max"].isna().tolist() == expected["max"].isna().tolist()
+
+    def test_does_not_mutate_input_frame(self, engine, events_df):
+        engine.process_time_series(events_df, time_column="ts", interval=TimeInterval.DAY)
+        assert events_df["ts"].tolist()[0] == "2024-01-02 10:05"
+
+
+class TestExecuteQueryCache:
+    @pytest.fixture
+    def datasource(self):
+        return MagicMock(id=7, type=DataSourceType.POSTGRESQL)
+
+    def test_repeated_select_is_served_from_cache(self, engine, datasource):
+        engine.db_connector = MagicMock()
+        engine.db_connector.execute_query.return_value = {"success": True, "data": []}
+        engine.execute_query(datasource, "SELECT * FROM sales")
+        engine.execute_query(datasource, "  SELECT * FROM sales\n")
+        assert engine.db_connector.execute_query.call_count == 1
+
+    def test_spacing_inside_literals_is_part_of_the_key(self, engine, datasource):
+        engine.db_connector = MagicMock()
+        engine.db_connector.execute_query.side_effect = [
+            {"success": True, "data": [{"name": "a  b"}]},
+            {"success": True, "data": []},
+        ]
+        first = engine.execute_query(datasource, "SELECT * FROM people WHERE name = 'a  b'")
+        second = engine.execute_query(datasource, "SELECT * FROM people WHERE name = 'a b'")
+        assert engine.db_connector.execute_query.call_count == 2
+        assert first["data"] == [{"name": "a  b"}]
+        assert second["data"] == []
+
+    def test_cached_result_is_not_shared_with_callers(self, engine, datasource):
+        engine.db_connector = MagicMock()
+        engine.db_connector.execute_query.return_value = {"success": True, "data": [{"amount": 1}]}
+        first = engine.execute_query(datasource, "SELECT * FROM sales")
+        first["data"][0]["amount"] = 99
+        second = engine.execute_query(datasource, "SELECT * FROM sales")
+        second["data"].clear()
+        third = engine.execute_query(datasource, "SELECT * FROM sales")
+        assert third["data"] == [{"amount": 1}]
+
+    def test_write_invalidates_datasource_results(self, engine, datasource):
+        engine.db_connector = MagicMock()
+        engine.db_connector.execute_query.return_value = {"success": True, "data": []}
+        engine.execute_query(datasource, "SELECT * FROM sales")
+        engine.execute_query(datasource, "DELETE FROM sales")
+        engine.execute_query(datasource, "SELECT * FROM sales")
+        assert engine.db_connector.execute_query.call_count == 3
+
+    def test_failed_queries_are_not_cached(self, engine, datasource):
+        engine.db_connector = MagicMock()
+        engine.db_connector.execute_query.return_value = {"success": False, "error": "boom"}
+        engine.execute_query(datasource, "SELECT * FROM sales")
+        engine.execute_query(datasource, "SELECT * FROM sales")
+        assert engine.db_connector.execute_query.call_count == 2
+
+    def test_max_rows_caps_fetched_rows(self, engine, datasource):
+        sqlite = create_engine("sqlite://")
+        with sqlite.begin() as conn:
+            conn.execute(text("CREATE TABLE sales (amount INTEGER)"))
+            conn.execute(text("INSERT INTO sales VALUES (1), (2), (3)"))
+        engine.db_connector.create_engine = MagicMock(return_value=sqlite)
+
+        capped = engine.execute_query(datasource, "SELECT amount FROM sales", max_rows=2)
+        full = engine.execute_query(datasource, "SELECT amount FROM sales", max_rows=3)
+
+        assert capped["data"] == [{"amount": 1}, {"amount": 2}]
+        assert capped["truncated"] is True
+        assert full["row_count"] == 3
+        assert full["truncated"] is False
+
+
+class TestOptimizeQuery:
+    def test_adds_default_limit_to_simple_select(self, engine):
+        assert engine.optimize_query("select *\n  from sales") == "select * from sales LIMIT 1000"
+
+    def test_inserts_limit_before_offset_case_insensitively(self, engine):
+        assert engine.optimize_query("SELECT * FROM sales offset 20") == "SELECT * FROM sales LIMIT 1000 OFFSET 20"
+
+    def test_leaves_grouped_and_limited_queries_alone(self, engine):
+        assert engine.optimize_query("SELECT region FROM sales GROUP\nBY region") == "SELECT region FROM sales GROUP BY region"
+        assert engine.optimize_query("SELECT * FROM sales limit 5") == "SELECT * FROM sales limit 5"
+
+
+class TestGetData:
+    def test_downcast_narrows_numeric_columns(self, engine, sales_df):
+        engine._load_data = MagicMock(return_value=sales_df)
+        datasource = MagicMock(type=DataSourceType.FILE)
+        result = engine.get_data(datasource, downcast=True)
+        assert result["amount"].dtype == "int8"
+        assert result["region"].dtype == object
+        assert engine.get_data(datasource)["amount"].dtype == "int64"
@@ -0,0 +1,374 @@
+"""Unit tests for app.services.chatbot."""
+import asyncio
+import json
+from datetime import datetime, timedelta
+from decimal import Decimal
+import pytest
+from unittest.mock import patch
+from sqlalchemy.orm import sessionmaker
+from langchain.schema import AIMessage, HumanMessage
+from langchain_community.chat_models.fake import FakeListChatModel
+
+from app.models.chatbot import ChatMessage, Conversation, QueryHistory
+from app.models.datasource import DataSource, DataSourceType
+from app.services.chatbot import ChatbotService, ProcessInput, _PreparedMessage, _rows_to_markdown
+
+
+@pytest.fixture
+def service(tmp_path, monkeypatch):
+    # AnalyticsEngine's FileUploadService creates its upload directory in the cwd
+    monkeypatch.chdir(tmp_path)
+    with patch.object(ChatbotService, "_initialize_llm", return_value=FakeListChatModel(
+        responses=["```sql\nSELECT * FROM orders\n```", "SELECT 2"]
+    )):
+        return ChatbotService()
+
+
+class TestConvertQueryToSql:
+    def test_repeated_question_reuses_generated_sql(self, service):
+        with patch("app.services.chatbot.cache_service") as redis_cache:
+            redis_cache.get.return_value = None
+            first = asyncio.run(service.aconvert_query_to_sql("All  orders", None, [], db=None))
+            second = asyncio.run(service.aconvert_query_to_sql("All orders", None, [], db=None))
+        assert first == second == "SELECT * FROM orders"
+        redis_cache.set.assert_called_once()
+
+    def test_different_question_calls_llm(self, service):
+        with patch("app.services.chatbot.cache_service") as redis_cache:
+            redis_cache.get.return_value = None
+            asyncio.run(service.aconvert_query_to_sql("All orders", None, [], db=None))
+            assert asyncio.run(service.aconvert_query_to_sql("Order count", None, [], db=None)) == "SELECT 2"
+
+    def test_extracts_sql_from_fenced_block_after_prose(self, tmp_path, monkeypatch):
+        monkeypatch.chdir(tmp_path)
+        llm = FakeListChatModel(responses=["Here you go:\n```postgresql\nSELECT id FROM users\n```\nDone."])
+        with patch.object(ChatbotService, "_initialize_llm", return_value=llm):
+            service = ChatbotService()
+        with patch("app.services.chatbot.cache_service") as redis_cache:
+            redis_cache.get.return_value = None
+            sql = asyncio.run(service.aconvert_query_to_sql("Users", None, [], db=None))
+        assert sql == "SELECT id FROM users"
+
+
+class TestGenerateResponse:
+    def test_single_value_skips_llm(self, service):
+        result = {"success": True, "data": [{"count": 42}], "columns": ["count"], "row_count": 1}
+        with patch.object(service, "_response_chain") as chain:
+            response = asyncio.run(service.agenerate_response("How many orders?", result))
+        assert response == "The result is 42."
+        chain.ainvoke.assert_not_called()
+
+    def test_single_row_is_listed(self, service):
+        result = {"success": True, "data": [{"min": 1, "max": 9}], "columns": ["min", "max"], "row_count": 1}
+        response = asyncio.run(service.agenerate_response("Range?", result))
+        assert response == "The query returned one row: min = 1, max = 9."
+
+
+class TestCalculateStatistics:
+    def test_summarizes_numeric_columns_only(self, service):
+        data = [{"n": 1, "name": "a", "price": Decimal("2.5")}, {"n": 3, "name": "b", "price": None}]
+
+        stats = service._calculate_statistics(data, ["n", "name", "price"])
+
+        assert stats == [
+            {"column": "n", "mean": 2.0, "median": 2.0, "min": 1.0, "max": 3.0, "std_dev": pytest.approx(1.41421356), "count": 2},
+            {"column": "price", "mean": 2.5, "median": 2.5, "min": 2.5, "max": 2.5, "std_dev": 0.0, "count": 1},
+        ]
+
+
+class TestExecuteQuery:
+    def test_rejects_write_keywords_as_whole_words(self, service):
+        result = service.execute_query("SELECT 1; drop table users", datasource=None)
+        assert result["success"] is False
+        assert "'DROP'" in result["error"]
+
+    def test_allows_identifiers_containing_keywords(self, service):
+        expected = {"data": [{"updated_at": 1}], "columns": ["updated_at"]}
+        with patch.object(service.analytics_engine, "execute_query", return_value=expected):
+            result = service.execute_query("WITH t AS (SELECT updated_at FROM x) SELECT * FROM t", datasource=None)
+        assert result["success"] is True
+        assert result["row_count"] == 1
+
+    def test_sql_errors_are_not_retried(self, service):
+        failed = {"success": False, "error": "syntax error at or near \"FORM\"", "retriable": False}
+        with patch.object(service.analytics_engine, "execute_query", return_value=failed) as execute:
+            result = service.execute_query("SELECT * FORM orders", datasource=None)
+        assert result["success"] is False
+        assert "syntax error" in result["error"]
+        assert execute.call_count == 1
+
+    def test_transient_errors_are_retried(self, service):
+        dropped = {"success": False, "error": "server closed the connection unexpectedly", "retriable": True}
+        expected = {"success": True, "data": [{"n": 1}], "columns": ["n"]}
+        with patch.object(service.analytics_engine, "execute_query", side_effect=[dropped, expected]) as execute, \
+                patch("app.services.chatbot.time.sleep"):
+            result = service.execute_query("SELECT 1 AS n", datasource=None)
+        assert result["success"] is True
+        assert execute.call_count == 2
+
+
+class TestSimilarPastQueries:
+    def test_ranks_successful_queries_by_word_overlap(self, service, db_session, test_user):
+        datasource = DataSource(name="warehouse", type=DataSourceType.POSTGRESQL, owner_id=test_user.id)
+        db_session.add(datasource)
+        db_session.flush()
+        for text, sql, success in [
+            ("total sales by region", "SELECT region, SUM(sales) FROM orders GROUP BY region", "true"),
+            ("sales by region last year", "SELECT region FROM orders WHERE year = 2023", "true"),
+            ("sales by region", "SELECT broken", "false"),
+            ("list customers", "SELECT * FROM customers", "true"),
+        ]:
+            db_session.add(QueryHistory(
+                user_id=test_user.id, datasource_id=datasource.id,
+                query_text=text, sql_query=sql, success=success,
+            ))
+        db_session.commit()
+
+        examples = service._similar_past_queries("Sales by region", datasource, db_session)
+
+        assert [text for text, sql in examples] == ["total sales by region", "sales by region last year"]
+
+
+class TestConversationContext:
+    def test_returns_latest_messages_in_chronological_order(self, service, db_session, test_user):
+        conversation = Conversation(user_id=test_user.id, title="t")
+        db_session.add(conversation)
+        db_session.flush()
+        base = datetime(2024, 1, 1)
+        for i, role in enumerate(["user", "assistant", "system", "user", "assistant"]):
+            db_session.add(ChatMessage(
+                conversation_id=conversation.id,
+                role=role,
+                content=f"m{i}",
+                created_at=base + timedelta(minutes=i),
+            ))
+        db_session.commit()
+
+        context = service.get_conversation_context(conversation.id, db_session, limit=4)
+        assert [type(msg) for msg in context] == [AIMessage, HumanMessage, AIMessage]
+        assert [msg.content for msg in context] == ["m1", "m3", "m4"]
+
+
+class TestProcessMessages:
+    def test_results_follow_input_order(self, service, db_session, test_user):
+        conversation = Conversation(user_id=test_user.id, title="t")
+        db_session.add(conversation)
+        db_session.commit()
+        batch = [
+            ProcessInput(user=test_user, message="first", conversation_id=conversation.id),
+            ProcessInput(user=test_user, message="new one"),
+            ProcessInput(user=test_user, message="second", conversation_id=conversation.id),
+            ProcessInput(user=test_user, message="missing", conversation_id=conversation.id + 100),
+        ]
+
+        results = asyncio.run(service.aprocess_messages(batch, session_factory=sessionmaker(bind=db_session.get_bind())))
+
+        assert results[0]["conversation_id"] == results[2]["conversation_id"] == conversation.id
+        assert results[1]["conversation_id"] != conversation.id
+        assert "error" in results[3]
+        contents = [
+            content for (content,) in db_session.query(ChatMessage.content)
+            .filter(ChatMessage.conversation_id == conversation.id, ChatMessage.role == "user")
+            .order_by(ChatMessage.id)
+        ]
+        assert contents == ["first", "second"]
+
+    def test_reply_and_analysis_come_from_one_llm_call(self, tmp_path, monkeypatch, db_session, test_user):
+        monkeypatch.chdir(tmp_path)
+        analysis = {
+            "response": "Open orders lead.",
+            "insights": {"summary": "s", "trends": [], "anomalies": [], "correlations": []},
+            "suggested_queries": ["a", "b", "c", "d", "e", "f"],
+            "visualization": {"chart_type": "bar_chart", "reasoning": "categories"},
+        }
+        llm = FakeListChatModel(responses=["SELECT status, total FROM orders", json.dumps(analysis)])
+        with patch.object(ChatbotService, "_initialize_llm", return_value=llm):
+            service = ChatbotService()
+        datasource = DataSource(name="warehouse", type=DataSourceType.POSTGRESQL, owner_id=test_user.id)
+        db_session.add(datasource)
+        db_session.commit()
+        query_result = {
+            "success": True,
+            "data": [{"status": "open", "total": 3}, {"status": "closed", "total": 5}],
+            "columns": ["status", "total"],
+            "row_count": 2,
+        }
+
+        with patch("app.services.chatbot.cache_service") as redis_cache, \
+                patch.object(service, "execute_query", return_value=query_result):
+            redis_cache.get.return_value = None
+            result = asyncio.run(service.aprocess_message(
+                user=test_user, message="Totals by status", conversation_id=None,
+                datasource_id=datasource.id, db=db_session,
+            ))
+
+        assert result["message"] == "Open orders lead."
+        assert result["suggested_queries"] == ["a", "b", "c", "d", "e"]
+        assert result["visualization_suggestion"]["config"] == {"x_axis": "status", "y_axis": "total"}
+        assert result["insights"]["summary"] == "s"
+
+    def test_single_row_result_skips_chart_and_insight_calls(self, service):
+        query_result = {"success": True, "data": [{"orders": 42}], "columns": ["orders"], "row_count": 1}
+        prepared = _PreparedMessage(None, None, "SELECT COUNT(*) AS orders FROM orders", query_result, None, [])
+
+        calls = service._extra_llm_calls("How many orders?", prepared)
+        for call in calls.values():
+            call.close()
+
+        assert service._canned_response(query_result) == "The result is 42."
+        assert list(calls) == ["suggested_queries"]
+
+
+class TestSchemaInfo:
+    def test_table_columns_are_introspected_once(self, service):
+        datasource = DataSource(
+            id=7,
+            type=DataSourceType.POSTGRESQL,
+            connection_config={"table_name": "orders"},
+            updated_at=datetime(2024, 1, 1),
+        )
+        with patch.object(service.analytics_engine.db_connector, "create_engine") as create_engine, \
+                patch("app.services.chatbot.inspect") as inspect:
+            inspect.return_value.get_columns.return_value = [{"name": "id"}, {"name": "total"}]
+            first = service._get_schema_info(datasource, db=None)
+            second = service._get_schema_info(datasource, db=None)
+            datasource.updated_at = datetime(2024, 1, 2)
+            service._get_schema_info(datasource, db=None)
+
+        assert first == second == "Table: orders\nColumns: id, total"
+        assert inspect.return_value.get_columns.call_count == 2
+        assert create_engine.call_count == 2
+
+    def test_all_tables_are_read_in_one_pass_without_table_name(self, service):
+        datasource = DataSource(id=8, type=DataSourceType.MYSQL, database_name="shop")
+        with patch.object(service.analytics_engine.db_connector, "create_engine"), \
+                patch("app.services.chatbot.inspect") as inspect:
+            inspect.return_value.get_multi_columns.return_value = {
+                (None, "users"): [{"name": "id"}],
+                (None, "orders"): [{"name": "id"}, {"name": "user_id"}],
+            }
+            info = service._get_schema_info(datasource, db=None)
+
+        assert info == "Table: orders\nColumns: id, user_id\nTable: users\nColumns: id"
+        inspect.return_value.get_columns.assert_not_called()
+
+    def test_invalidate_schema_forces_reintrospection(self, service):
+        datasource = DataSource(id=9, type=DataSourceType.POSTGRESQL, connection_config={"table_name": "orders"})
+        with patch.object(service.analytics_engine.db_connector, "create_engine"), \
+                patch("app.services.chatbot.inspect") as inspect:
+            inspect.return_value.get_columns.return_value = [{"name": "id"}]
+            service._get_schema_info(datasource, db=None)
+            service.invalidate_schema(9)
+            service._get_schema_info(datasource, db=None)
+
+        assert inspect.return_value.get_columns.call_count == 2
+
+
+class TestSuggestVisualization:
+    def test_heuristic_looks_past_null_first_row(self, service):
+        data = [{"order_date": "2024-01-01", "total": None}] + [
+            {"order_date": f"2024-01-{day:02d}", "total": Decimal(day)} for day in range(2, 20)
+        ]
+        result = {"success": True, "data": data, "columns": ["order_date", "total"]}
+
+        suggestion = asyncio.run(service.asuggest_visualization("Daily totals", result))
+
+        assert suggestion["chart_type"] == "line_chart"
+        assert suggestion["config"] == {"x_axis": "order_date", "y_axis": "total"}
+
+    def test_heuristic_ignores_mostly_text_columns(self, service):
+        data = [{"region": str(i) if i == 0 else f"r{i}", "total": "n/a" if i == 0 else str(i)} for i in range(20)]
+        result = {"success": True, "data": data, "columns": ["region", "total"]}
+
+        suggestion = asyncio.run(service.asuggest_visualization("Totals by region", result))
+
+        assert suggestion["chart_type"] == "bar_chart"
+        assert suggestion["config"] == {"x_axis": "region", "y_axis": "total"}
+
+    def test_llm_suggestion_is_reused_for_same_question_and_columns(self, tmp_path, monkeypatch):
+        monkeypatch.chdir(tmp_path)
+        llm = FakeListChatModel(responses=['{"chart_type": "pie_chart", "reasoning": "shares"}', "not json"])
+        with patch.object(ChatbotService, "_initialize_llm", return_value=llm):
+            service = ChatbotService()
+        result = {"success": True, "data": [{"status": "open", "n": 3}], "columns": ["status", "n"]}
+
+        first = asyncio.run(service.asuggest_visualization("Orders by status?", result))
+        second = asyncio.run(service.asuggest_visualization("orders by  STATUS", result))
+
+        assert first == second
+        assert first["chart_type"] == "pie_chart"
+
+
+class TestProcessMessageStream:
+    def test_streamed_tokens_match_saved_reply(self, service, db_session, test_user):
+        datasource = DataSource(
+            name="warehouse",
+            type=DataSourceType.POSTGRESQL,
+            owner_id=test_user.id,
+            is_active=True,
+        )
+        db_session.add(datasource)
+        db_session.commit()
+        query_result = {
+            "success": True,
+            "data": [{"status": "open", "total": 3}, {"status": "closed", "total": 5}],
+            "columns": ["status", "total"],
+            "row_count": 2,
+            "execution_time": 0.01,
+        }
+
+        async def collect():
+            return [
+                event async for event in service.aprocess_message_stream(
+                    user=test_user,
+                    message="Orders by status",
+                    conversation_id=None,
+                    datasource_id=datasource.id,
+                    db=db_session,
+                )
+            ]
+
+        with patch("app.services.chatbot.cache_service") as redis_cache, \
+                patch.object(service, "execute_query", return_value=query_result):
+            redis_cache.get.return_value = None
+            events = asyncio.run(collect())
+
+        assert events[0]["event"] == "metadata"
+        assert events[0]["sql_query"] == "SELECT * FROM orders"
+        done = events[-1]
+        assert done["event"] == "done"
+        streamed = "".join(event["content"] for event in events if event["event"] == "token")
+        assert streamed.strip() == done["message"]
+        saved = db_session.get(ChatMessage, done["message_id"])
+        assert saved.content == done["message"]
+        assert saved.message_metadata["sql_query"] == "SELECT * FROM orders"
+
+
+class TestRowsToMarkdown:
+    def test_skips_empty_columns_and_truncates_cells(self):
+        rows = [{"id": 1, "note": None, "name": "a|b"}, {"id": 2, "note": None, "name": "x" * 100}]
+
+        table = _rows_to_markdown(rows, ["id", "note", "name"]).splitlines()
+
+        assert table[0] == "| id | name |"
+        assert table[2] == "| 1 | a\\|b |"
+        assert table[3] == "| 2 | " + "x" * 80 + " |"
+
+
+class TestFileQuery:
+    def test_file_is_read_once_and_repeated_questions_reuse_the_reply(self, service, tmp_path):
+        path = tmp_path / "sales.csv"
+        path.write_text("region,amount\nnorth,10\nsouth,25\n")
+        datasource = DataSource(id=21, type=DataSourceType.FILE, file_path=str(path))
+
+        with patch.object(service.analytics_engine, "get_data", wraps=service.analytics_engine.get_data) as get_data:
+            first = asyncio.run(service._aprocess_file_query(None, "Sales by region?", datasource, db=None))
+            second = asyncio.run(service._aprocess_file_query(None, "sales by region", datasource, db=None))
+            other = asyncio.run(service._aprocess_file_query(None, "Largest amount?", datasource, db=None))
+
+        assert get_data.call_count == 1
+        assert first == second
+        assert other != first
+        system_text = next(iter(service._file_prompt_cache.values()))
+        assert "Available columns: region, amount" in system_text
+        assert "Sales by region" not in system_text
@@ -0,0 +1,158 @@
+"""Unit tests for app.services.database_connector."""
+import pytest
+import pandas as pd
+from unittest.mock import MagicMock, patch
+from sqlalchemy import create_engine, event, text
+from sqlalchemy.exc import DBAPIError
+from sqlalchemy.pool import StaticPool
+
+from app.core.memory_cache import MemoryCache
+from app.models.datasource import DataSourceType
+from app.services.database_connector import DatabaseConnector
+
+
+@pytest.fixture
+def connector():
+    return DatabaseConnector()
+
+
+@pytest.fixture
+def datasource():
+    return MagicMock(id=11, type=DataSourceType.POSTGRESQL)
+
+
+class TestExecuteQuery:
+    def test_stale_connection_is_retried_once(self, connector, datasource):
+        stale = DBAPIError("SELECT 1", {}, Exception("server closed the connection"), connection_invalidated=True)
+        with patch.object(connector, "_fetch_rows", side_effect=[stale, (["n"], [{"n": 1}], False)]) as fetch:
+            result = connector.execute_query(datasource, "SELECT 1 AS n")
+        assert result["success"] is True
+        assert result["data"] == [{"n": 1}]
+        assert fetch.call_count == 2
+
+    def test_other_errors_are_reported_without_retry(self, connector, datasource):
+        error = DBAPIError("SELECT nope", {}, Exception("column does not exist"))
+        with patch.object(connector, "_fetch_rows", side_effect=error) as fetch:
+            result = connector.execute_query(datasource, "SELECT nope")
+        assert result["success"] is False
+        assert fetch.call_count == 1
+
+
+class TestCreateEngine:
+    def test_pre_ping_is_opt_in_per_datasource(self, connector):
+        datasource = MagicMock(id=12, type=DataSourceType.POSTGRESQL, connection_config={"pool_pre_ping": True})
+        with patch("app.services.database_connector.create_engine") as create_engine, \
+                patch.dict(DatabaseConnector._engines, clear=True):
+            connector.create_engine(datasource, password="secret")
+        assert create_engine.call_args.kwargs["pool_pre_ping"] is True
+
+
+class TestExecuteQueryDataframe:
+    @pytest.fixture
+    def sqlite(self, connector):
+        engine = create_engine("sqlite://", poolclass=StaticPool)
+        with engine.begin() as conn:
+            conn.execute(text("CREATE TABLE sales (region TEXT, amount INTEGER)"))
+            conn.execute(text("INSERT INTO sales VALUES ('north', 1), ('south', 2), ('east', 3)"))
+        connector.create_engine = MagicMock(return_value=engine)
+        return engine
+
+    def test_rows_come_back_in_order(self, connector, datasource, sqlite):
+        df = connector.execute_query_dataframe(datasource, "SELECT * FROM sales ORDER BY amount")
+        assert df["amount"].tolist() == [1, 2, 3]
+
+    def test_empty_result_keeps_columns(self, connector, datasource, sqlite):
+        df = connector.execute_query_dataframe(datasource, "SELECT * FROM sales WHERE amount > :floor", params={"floor": 10})
+        assert df.empty
+        assert df.columns.tolist() == ["region", "amount"]
+
+
+class TestSchemaCache:
+    def test_tables_are_listed_once_until_the_connection_is_closed(self, connector, datasource):
+        with patch("app.services.database_connector.inspect") as inspect, \
+                patch.object(connector, "create_engine"), \
+                patch.object(DatabaseConnector, "_schema_cache", MemoryCache()):
+            inspect.return_value.get_table_names.return_value = ["orders"]
+            assert connector.get_tables(datasource) == ["orders"]
+            assert connector.get_tables(datasource) == ["orders"]
+            connector.close_connection(datasource.id)
+            connector.get_tables(datasource)
+
+        assert inspect.return_value.get_table_names.call_count == 2
+
+    def test_table_schema_is_read_over_one_connection(self, connector, datasource):
+        engine = create_engine("sqlite://", poolclass=StaticPool)
+        with engine.begin() as conn:
+            conn.execute(text("CREATE TABLE orders (id INTEGER PRIMARY KEY, total REAL)"))
+        connector.create_engine = MagicMock(return_value=engine)
+        checkouts = []
+        event.listen(engine, "checkout", lambda *args: checkouts.append(args))
+
+        with patch.object(DatabaseConnector, "_schema_cache", MemoryCache()):
+            schema = connector.get_table_schema(datasource, "orders")
+
+        assert [column["name"] for column in schema["columns"]] == ["id", "total"]
+        assert schema["primary_keys"] == ["id"]
+        assert len(checkouts) == 1
+
+
+class TestQueryLimit:
+    def test_limit_is_appended_as_a_bound_parameter(self, connector, datasource):
+        engine = create_engine("sqlite://", poolclass=StaticPool)
+        with engine.begin() as conn:
+            conn.execute(text("CREATE TABLE sales (amount INTEGER)"))
+            conn.execute(text("INSERT INTO sales VALUES (3), (1), (2)"))
+        connector.create_engine = MagicMock(return_value=engine)
+
+        result = connector.execute_query(datasource, "SELECT amount FROM sales ORDER BY amount;\n", limit=2)
+
+        assert result["success"] is True
+        assert result["data"] == [{"amount": 1}, {"amount": 2}]
+        assert result["query"] == "SELECT amount FROM sales ORDER BY amount LIMIT :_row_limit"
+
+    def test_dataframe_limit_is_bound_for_selects_only(self, connector, datasource):
+        engine = create_engine("sqlite://", poolclass=StaticPool)
+        with engine.begin() as conn:
+            conn.execute(text("CREATE TABLE sales (amount INTEGER)"))
+            conn.execute(text("INSERT INTO sales VALUES (3), (1), (2)"))
+        connector.create_engine = MagicMock(return_value=engine)
+
+        with patch("app.services.database_connector.pd.read_sql", wraps=pd.read_sql) as read_sql:
+            df = connector.execute_query_dataframe(datasource, "SELECT amount FROM sales ORDER BY amount;", limit=2)
+            plan = connector.execute_query_dataframe(
+                datasource, "EXPLAIN QUERY PLAN SELECT amount FROM sales", limit=2
+            )
+
+        assert df["amount"].tolist() == [1, 2]
+        assert str(read_sql.call_args_list[0].args[0]) == "SELECT amount FROM sales ORDER BY amount LIMIT :_row_limit"
+        assert read_sql.call_args_list[0].kwargs["params"] == {"_row_limit": 2}
+        assert read_sql.call_args_list[1].args[0] == "EXPLAIN QUERY PLAN SELECT amount FROM sales"
+        assert not plan.empty
+
+    def test_other_statements_are_not_limited(self, connector, datasource):
+        engine = create_engine("sqlite://", poolclass=StaticPool)
+        with engine.begin() as conn:
+            conn.execute(text("CREATE TABLE sales (amount INTEGER)"))
+        connector.create_engine = MagicMock(return_value=engine)
+
+        result = connector.execute_query(datasource, "EXPLAIN QUERY PLAN SELECT amount FROM sales", limit=2)
+
+        assert result["success"] is True
+        assert result["query"] == "EXPLAIN QUERY PLAN SELECT amount FROM sales"
+
+
+class TestStreaming:
+    @pytest.mark.parametrize("query, streamed", [
+        ("SELECT * FROM sales", True),
+        ("  with t AS (SELECT 1) SELECT * FROM t", True),
+        ("EXPLAIN ANALYZE SELECT * FROM sales", False),
+        ("SHOW TABLES", False),
+    ])
+    def test_only_select_statements_use_a_server_side_cursor(self, connector, datasource, query, streamed):
+        conn = MagicMock()
+        conn.execute.return_value.keys.return_value = []
+        conn.execution_options.return_value = conn
+        with patch.object(connector, "get_connection") as get_connection:
+            get_connection.return_value.__enter__.return_value = conn
+            connector._fetch_rows(datasource, None, query, None, None)
+        assert conn.execution_options.called is streamed
@@ -0,0 +1,79 @@
+"""Unit tests for app.services.file_upload."""
+import asyncio
+import io
+from pathlib import Path
+import pytest
+from fastapi import HTTPException, UploadFile
+import pandas as pd
+
+from app.services.file_upload import FileUploadService
+
+
+@pytest.fixture
+def service(tmp_path):
+    return FileUploadService(upload_dir=str(tmp_path))
+
+
+class TestCleanData:
+    def test_strips_text_and_keeps_missing_values_missing(self, service):
+        df = pd.DataFrame({"name": [" north ", None, ""], "amount": [" 1", "2 ", None]})
+
+        cleaned = service.clean_data(df)
+
+        assert cleaned["name"].tolist()[0] == "north"
+        assert cleaned["name"].isna().tolist() == [False, True, True]
+        assert cleaned["amount"].tolist()[:2] == [1.0, 2.0]
+        assert df["name"].tolist()[0] == " north "
+
+    def test_drops_empty_rows_and_columns(self, service):
+        df = pd.DataFrame({"a": ["x", None], "b": [None, None]})
+        assert service.clean_data(df).shape == (1, 1)
+
+    def test_column_order_and_duplicate_names_are_kept(self, service):
+        df = pd.DataFrame([[" a ", 1, "2", "b"]], columns=["x", "n", "x", "y"])
+        cleaned = service.clean_data(df)
+        assert cleaned.columns.tolist() == ["x", "n", "x", "y"]
+        assert cleaned.iloc[0].tolist() == ["a", 1, 2, "b"]
+
+
+class TestParseFile:
+    def test_numeric_columns_are_narrowed_when_asked(self, tmp_path):
+        path = tmp_path / "sales.csv"
+        path.write_text("region,amount,ratio,price\nnorth,10,1.5,19.99\nsouth,25,2.25,120.10\n")
+
+        df, metadata = FileUploadService(upload_dir=str(tmp_path), optimize_dtypes=True).parse_file(str(path))
+
+        assert df["amount"].dtype == "int8"
+        assert df["ratio"].dtype == "float32"
+        assert df["price"].dtype == "float64"
+        assert df["price"].tolist() == [19.99, 120.10]
+        assert metadata["dtypes"]["region"] == "object"
+        assert metadata["memory_usage_bytes"] == int(df.memory_usage().sum())
+
+    def test_dtypes_are_kept_by_default(self, service, tmp_path):
+        path = tmp_path / "sales.csv"
+        path.write_text("amount,price\n10,1.5\n")
+        df, _ = service.parse_file(str(path))
+        assert df["amount"].dtype == "int64"
+        assert df["price"].dtype == "float64"
+
+
+class TestSaveFile:
+    def test_oversized_upload_is_rejected_and_removed(self, service, tmp_path):
+        service.MAX_FILE_SIZE = 10
+        service.CHUNK_SIZE = 4
+        upload = UploadFile(file=io.BytesIO(b"a,b\n1,2\n3,4\n"), filename="big.csv")
+
+        with pytest.raises(HTTPException):
+            asyncio.run(service.save_file(upload, user_id=1))
+
+        assert list((tmp_path / "1").iterdir()) == []
+
+    def test_upload_is_written_in_full(self, service):
+        upload = UploadFile(file=io.BytesIO(b"a,b\n1,2\n"), filename="small.csv")
+        service.CHUNK_SIZE = 3
+
+        info = asyncio.run(service.save_file(upload, user_id=1))
+
+        assert info["file_size"] == 8
+        assert Path(info["file_path"]).read_bytes() == b"a,b\n1,2\n"
@@ -0,0 +1,44 @@
+"""Unit tests for app.core.memory_cache."""
+from unittest.mock import patch
+
+from app.core.memory_cache import MemoryCache
+
+
+class TestMemoryCache:
+    def test_missing_key_returns_none(self):
+        assert MemoryCache().get("missing") is None
+
+    def test_least_recently_used_entry_is_evicted(self):
+        cache = MemoryCache(maxsize=2)
+        cache.set("a", 1)
+        cache.set("b", 2)
+        cache.get("a")
+        cache.set("c", 3)
+        assert cache.get("b") is None
+        assert cache.get("a") == 1
+        assert cache.get("c") == 3
+        assert len(cache) == 2
+
+    def test_entries_expire_after_ttl(self):
+        cache = MemoryCache(ttl=10)
+        with patch("app.core.memory_cache.time.monotonic", return_value=100.0):
+            cache.set("a", 1)
+        with patch("app.core.memory_cache.time.monotonic", return_value=109.0):
+            assert cache.get("a") == 1
+        with patch("app.core.memory_cache.time.monotonic", return_value=110.0):
+            assert cache.get("a") is None
+        assert len(cache) == 0
+
+    def test_invalidate_drops_matching_keys(self):
+        cache = MemoryCache()
+        cache.set((1, "orders"), "x")
+        cache.set((1, "sales"), "y")
+        cache.set((2, "orders"), "z")
+        cache.invalidate(lambda key: key[0] == 1)
+        assert cache.values() == ["z"]
+
+    def test_clear_drops_everything(self):
+        cache = MemoryCache()
+        cache.set("a", 1)
+        cache.clear()
+        assert len(cache) == 0
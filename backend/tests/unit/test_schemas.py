@@ -0,0 +1,38 @@
+"""Unit tests for app.schemas."""
+import importlib
+import pkgutil
+
+from pydantic import BaseModel
+
+import app.schemas
+
+
+def _schema_models():
+    """All BaseModel subclasses defined in the app.schemas modules."""
+    models = []
+    for module_info in pkgutil.iter_modules(app.schemas.__path__):
+        module = importlib.import_module(f"app.schemas.{module_info.name}")
+        for obj in vars(module).values():
+            if (
+                isinstance(obj, type)
+                and issubclass(obj, BaseModel)
+                and obj.__module__ == module.__name__
+            ):
+                models.append(obj)
+    return models
+
+
+class TestSchemaRegistry:
+    def test_no_duplicate_schemas(self):
+        """OpenAPI component names come from class names, so they must be unique."""
+        names = [model.__name__ for model in _schema_models()]
+        duplicates = sorted({name for name in names if names.count(name) > 1})
+        assert duplicates == []
+
+    def test_package_exports_are_unique(self):
+        assert len(app.schemas.__all__) == len(set(app.schemas.__all__))
+
+    def test_package_exports_resolve_to_defined_schemas(self):
+        models = set(_schema_models())
+        for name in app.schemas.__all__:
+            assert getattr(app.schemas, name) in models
@@ -22,6 +22,7 @@ export interface ExecutionResult {
   total_rows?: number
   error?: string
   execution_time?: number
+  truncated?: boolean
 }
 
 export interface VisualizationSuggestion {